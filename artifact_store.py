@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Artifact Store - Content-addressed, compressed storage for run outputs
+"""
+import argparse
+import gzip
+import hashlib
+import io
+import json
+import logging
+import lzma
+import os
+import pathlib
+import shutil
+import sys
+import tempfile
+from datetime import datetime
+from typing import BinaryIO, Dict, Optional, Union
+
+# Optional zstandard codec (graceful fallback)
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Blob file suffix per codec; 'zlib' uses the gzip container so it can be streamed
+CODEC_SUFFIXES = {
+    'lzma': '.xz',
+    'zlib': '.gz',
+    'zstd': '.zst',
+}
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class ArtifactStoreError(Exception):
+    """Base exception for artifact store errors"""
+    pass
+
+
+class ArtifactStore:
+    """Stores artifacts once per content hash and records each run in a JSON manifest"""
+
+    def __init__(self, root: str, run_id: str, codec: str = 'lzma'):
+        if codec not in CODEC_SUFFIXES:
+            raise ArtifactStoreError(f"Unknown codec: {codec} (choose from {', '.join(CODEC_SUFFIXES)})")
+        if codec == 'zstd' and not ZSTD_AVAILABLE:
+            logger.warning("zstandard is not installed, falling back to lzma")
+            codec = 'lzma'
+
+        self.root = pathlib.Path(root)
+        self.blobs_dir = self.root / "blobs"
+        self.runs_dir = self.root / "runs"
+        self.blobs_dir.mkdir(parents=True, exist_ok=True)
+        self.runs_dir.mkdir(parents=True, exist_ok=True)
+        self.codec = codec
+        self.run_id = run_id
+        self.manifest_path = self.runs_dir / f"{run_id}.json"
+        self.manifest = {
+            'run_id': run_id,
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'artifacts': {}
+        }
+
+    def _blob_path(self, digest: str, codec: str) -> pathlib.Path:
+        return self.blobs_dir / digest[:2] / f"{digest}{CODEC_SUFFIXES[codec]}"
+
+    def _find_blob(self, digest: str) -> Optional[pathlib.Path]:
+        """Locate an existing blob for a digest, whatever codec it was stored with"""
+        for codec in CODEC_SUFFIXES:
+            blob_path = self._blob_path(digest, codec)
+            if blob_path.exists():
+                return blob_path
+        return None
+
+    def _compress(self, data: bytes) -> bytes:
+        if self.codec == 'lzma':
+            return lzma.compress(data, preset=6)
+        if self.codec == 'zstd':
+            return zstandard.ZstdCompressor(level=10).compress(data)
+        # gzip.compress() only takes mtime from Python 3.8; fixed mtime keeps blobs reproducible
+        buffer = io.BytesIO()
+        with gzip.GzipFile(fileobj=buffer, mode='wb', compresslevel=9, mtime=0) as stream:
+            stream.write(data)
+        return buffer.getvalue()
+
+    def put(self, name: str, content: Union[str, bytes]) -> str:
+        """Store an artifact under `name` for this run and return its content hash"""
+        data = content.encode('utf-8') if isinstance(content, str) else content
+        digest = hashlib.sha256(data).hexdigest()
+
+        blob_path = self._find_blob(digest)
+        deduplicated = blob_path is not None
+        if not deduplicated:
+            blob_path = self._blob_path(digest, self.codec)
+            blob_path.parent.mkdir(exist_ok=True)
+            # Write to a temp file first so concurrent runs never see partial blobs
+            fd, tmp_name = tempfile.mkstemp(dir=str(blob_path.parent), suffix='.tmp')
+            with os.fdopen(fd, 'wb') as tmp:
+                tmp.write(self._compress(data))
+            os.replace(tmp_name, blob_path)
+
+        self.manifest['artifacts'][name] = {
+            'sha256': digest,
+            'size': len(data),
+            'stored_size': blob_path.stat().st_size,
+            'blob': blob_path.relative_to(self.root).as_posix(),
+            'deduplicated': deduplicated,
+        }
+        self._write_manifest()
+        return digest
+
+    def _write_manifest(self):
+        tmp_path = self.manifest_path.with_suffix('.json.tmp')
+        tmp_path.write_text(json.dumps(self.manifest, indent=2), encoding='utf-8')
+        os.replace(tmp_path, self.manifest_path)
+
+    def open(self, digest: str) -> BinaryIO:
+        """Open a blob for streaming, decompressing as it is read"""
+        blob_path = self._find_blob(digest)
+        if blob_path is None:
+            raise ArtifactStoreError(f"Blob not found: {digest}")
+        if blob_path.suffix == '.xz':
+            return lzma.open(blob_path, 'rb')
+        if blob_path.suffix == '.zst':
+            if not ZSTD_AVAILABLE:
+                raise ArtifactStoreError("zstandard is required to read .zst blobs")
+            return zstandard.ZstdDecompressor().stream_reader(open(blob_path, 'rb'), closefd=True)
+        return gzip.open(blob_path, 'rb')
+
+    def read_text(self, digest: str) -> str:
+        """Read a whole artifact back as text"""
+        with self.open(digest) as stream:
+            return stream.read().decode('utf-8')
+
+    def load_manifest(self, run_id: str) -> Dict:
+        """Load the manifest of a previous run"""
+        manifest_path = self.runs_dir / f"{run_id}.json"
+        if not manifest_path.exists():
+            raise ArtifactStoreError(f"Run manifest not found: {manifest_path}")
+        return json.loads(manifest_path.read_text(encoding='utf-8'))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Inspect the content-addressed artifact store'
+    )
+    parser.add_argument(
+        '--root',
+        default='artifacts',
+        help='Artifact store directory (default: artifacts)'
+    )
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('runs', help='List recorded runs')
+    list_parser = subparsers.add_parser('ls', help='List artifacts of a run')
+    list_parser.add_argument('run_id')
+    cat_parser = subparsers.add_parser('cat', help='Stream an artifact to stdout')
+    cat_parser.add_argument('run_id')
+    cat_parser.add_argument('name')
+
+    args = parser.parse_args()
+    store_root = pathlib.Path(args.root)
+    if not store_root.exists():
+        sys.exit(f"Artifact store not found: {store_root}")
+    store = ArtifactStore(args.root, run_id='inspect')
+
+    try:
+        if args.command == 'runs':
+            for manifest_path in sorted(store.runs_dir.glob('*.json')):
+                sys.stdout.write(f"{manifest_path.stem}\n")
+        elif args.command == 'ls':
+            for name, entry in store.load_manifest(args.run_id)['artifacts'].items():
+                sys.stdout.write(f"{entry['size']:>12} {entry['stored_size']:>10}  {entry['sha256'][:12]}  {name}\n")
+        else:
+            artifacts = store.load_manifest(args.run_id)['artifacts']
+            if args.name not in artifacts:
+                raise ArtifactStoreError(f"Artifact not found in run {args.run_id}: {args.name}")
+            with store.open(artifacts[args.name]['sha256']) as stream:
+                shutil.copyfileobj(stream, sys.stdout.buffer, CHUNK_SIZE)
+    except ArtifactStoreError as e:
+        sys.exit(str(e))
+
+
+if __name__ == "__main__":
+    main()
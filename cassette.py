@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Cassette - Record and replay external tool calls for offline profiling and regression tests
+"""
+import hashlib
+import json
+import logging
+import os
+import pathlib
+import re
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Prompts are piped from a file; hash the file so replay matches on prompt content
+PROMPT_FILE_PATTERN = re.compile(r"Get-Content '([^']+)'")
+# Semgrep shards write their JSON with --output instead of stdout
+OUTPUT_FILE_PATTERN = re.compile(r'--output "([^"]+)"')
+
+MODES = ('record', 'replay')
+TIMINGS = ('instant', 'original')
+
+
+class CassetteError(Exception):
+    """Base exception for cassette errors"""
+    pass
+
+
+class Cassette:
+    """A file of recorded tool calls, shared by every pipeline in the process that opens the same path"""
+
+    _open_cassettes: Dict[str, 'Cassette'] = {}
+    _registry_lock = threading.Lock()
+
+    def __init__(self, path: str, mode: str, timing: str = 'instant'):
+        if mode not in MODES:
+            raise CassetteError(f"Unknown cassette mode: {mode}")
+        if timing not in TIMINGS:
+            raise CassetteError(f"Unknown replay timing: {timing}")
+        self.path = pathlib.Path(path)
+        self.mode = mode
+        self.timing = timing
+        self.lock = threading.Lock()
+        self.calls = []
+        self.used = set()
+
+        if mode == 'replay':
+            if not self.path.exists():
+                raise CassetteError(f"Cassette not found: {self.path}")
+            try:
+                self.calls = json.loads(self.path.read_text(encoding='utf-8'))['calls']
+            except (json.JSONDecodeError, KeyError) as e:
+                raise CassetteError(f"Invalid cassette {self.path}: {e}")
+            logger.info(f"Replaying {len(self.calls)} recorded call(s) from {self.path} ({timing})")
+        else:
+            logger.info(f"Recording tool calls to {self.path}")
+
+    @classmethod
+    def open(cls, path: str, mode: str, timing: str = 'instant') -> 'Cassette':
+        """Return the process-wide cassette for `path`, creating it on first use"""
+        key = str(pathlib.Path(path).resolve())
+        with cls._registry_lock:
+            if key not in cls._open_cassettes:
+                cls._open_cassettes[key] = cls(path, mode, timing)
+            return cls._open_cassettes[key]
+
+    @staticmethod
+    def _prompt_hash(cmd: str, normalize: Callable[[str], str]) -> Optional[str]:
+        match = PROMPT_FILE_PATTERN.search(cmd)
+        if not match:
+            return None
+        try:
+            prompt = pathlib.Path(match.group(1)).read_text(encoding='utf-8')
+        except OSError:
+            return None
+        return hashlib.sha256(normalize(prompt).encode('utf-8')).hexdigest()
+
+    def _save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix('.tmp')
+        tmp_path.write_text(json.dumps({
+            'version': 1,
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'calls': self.calls
+        }, indent=2, ensure_ascii=False), encoding='utf-8')
+        os.replace(tmp_path, self.path)
+
+    def record(self, cmd: str, description: str, output: str, exit_code: int, latency: float,
+               normalize: Callable[[str], str] = lambda text: text):
+        """Store one finished call"""
+        call = {
+            'description': description,
+            'command': normalize(cmd),
+            'prompt_hash': self._prompt_hash(cmd, normalize),
+            'output': output,
+            'exit_code': exit_code,
+            'latency': round(latency, 3),
+        }
+        output_file = OUTPUT_FILE_PATTERN.search(cmd)
+        if output_file and pathlib.Path(output_file.group(1)).exists():
+            call['output_file'] = pathlib.Path(output_file.group(1)).read_text(encoding='utf-8')
+        with self.lock:
+            call['seq'] = len(self.calls)
+            self.calls.append(call)
+            self._save()
+
+    def replay(self, cmd: str, description: str,
+               normalize: Callable[[str], str] = lambda text: text, wait: bool = True) -> dict:
+        """Return the recorded call for a command, preferring an identical prompt
+
+        With original timing the call's recorded latency is slept first, unless `wait` is False.
+        """
+        prompt_hash = self._prompt_hash(cmd, normalize)
+        with self.lock:
+            unused = [call for call in self.calls if call['seq'] not in self.used]
+            candidates = (
+                [c for c in unused if c['description'] == description and c['prompt_hash'] == prompt_hash]
+                or [c for c in unused if c['command'] == normalize(cmd)]
+                or [c for c in unused if c['description'] == description]
+            )
+            if not candidates:
+                raise CassetteError(f"No recorded call left for: {description}")
+            call = candidates[0]
+            self.used.add(call['seq'])
+        if prompt_hash != call['prompt_hash']:
+            logger.warning(f"Replaying {description} with a different prompt than was recorded")
+
+        output_file = OUTPUT_FILE_PATTERN.search(cmd)
+        if output_file and 'output_file' in call:
+            pathlib.Path(output_file.group(1)).write_text(call['output_file'], encoding='utf-8')
+        if wait and self.timing == 'original':
+            time.sleep(call['latency'])
+        return call
+
+    def run(self, cmd: str, description: str, execute: Callable[[], Tuple[str, int]],
+            normalize: Callable[[str], str] = lambda text: text) -> Tuple[str, int]:
+        """Record `execute()` or replay it, returning (output, exit code)"""
+        if self.mode == 'replay':
+            call = self.replay(cmd, description, normalize)
+            return call['output'], call['exit_code']
+        started = time.monotonic()
+        output, exit_code = execute()
+        self.record(cmd, description, output, exit_code, time.monotonic() - started, normalize)
+        return output, exit_code
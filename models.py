@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Models - Typed records passed between pipeline steps
+
+Tool and LLM output is parsed once where it enters the pipeline; text is only
+produced again when an artifact is saved or a prompt is rendered.
+"""
+import json
+import pathlib
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+# Fields are declared in __slots__ by hand (dataclass(slots=True) needs Python 3.10),
+# which rules out field defaults; build instances through the classmethods instead.
+
+
+@dataclass
+class Finding:
+    """One Semgrep result; `raw` keeps the full result for offsets, autofixes and saving"""
+    __slots__ = ('check_id', 'path', 'line', 'message', 'raw', 'code')
+    check_id: str
+    path: str
+    line: Optional[int]
+    message: str
+    raw: Dict[str, Any]
+    # Matched source read from the file; Semgrep OSS reports "requires login" in extra.lines
+    code: Optional[str]
+
+    @classmethod
+    def from_result(cls, result: Dict[str, Any]) -> 'Finding':
+        return cls(
+            check_id=result.get('check_id', ''),
+            path=pathlib.PurePosixPath(result.get('path', '').replace('\\', '/')).as_posix(),
+            line=result.get('start', {}).get('line'),
+            message=result.get('extra', {}).get('message', ''),
+            raw=result,
+            code=None,
+        )
+
+    @property
+    def rule(self) -> str:
+        """Rule id without the config path prefix"""
+        return self.check_id.rsplit('.', 1)[-1]
+
+    @property
+    def fingerprint(self) -> Tuple[str, str, str]:
+        """Identity independent of line numbers, so edits elsewhere in a file don't count"""
+        code = self.code if self.code is not None else self.raw.get('extra', {}).get('lines', '')
+        return self.check_id, self.message, code.strip()
+
+
+@dataclass
+class Findings:
+    """A Semgrep report: results, errors and the remaining top-level keys"""
+    __slots__ = ('results', 'errors', 'meta', 'parsed', 'text')
+    results: List[Finding]
+    errors: List[dict]
+    meta: Dict[str, Any]
+    parsed: bool
+    # Source text while the report is unchanged; None once it has to be serialized
+    text: Optional[str]
+
+    @classmethod
+    def from_document(cls, document: Dict[str, Any], text: Optional[str] = None) -> 'Findings':
+        return cls(
+            results=[Finding.from_result(result) for result in document.get('results', [])],
+            errors=list(document.get('errors', [])),
+            meta={key: value for key, value in document.items() if key not in ('results', 'errors')},
+            parsed=True,
+            text=text,
+        )
+
+    @classmethod
+    def parse(cls, text: str) -> 'Findings':
+        """Parse Semgrep JSON output; unparseable output is kept as text"""
+        try:
+            document = json.loads(text)
+        except json.JSONDecodeError:
+            document = None
+        if not isinstance(document, dict):
+            return cls(results=[], errors=[], meta={}, parsed=False, text=text)
+        return cls.from_document(document, text)
+
+    def replace_results(self, results: List[Finding]) -> 'Findings':
+        """Same report with a different set of results"""
+        return Findings(results=results, errors=self.errors, meta=self.meta, parsed=self.parsed, text=None)
+
+    def to_document(self) -> Dict[str, Any]:
+        document = {'results': [finding.raw for finding in self.results], 'errors': self.errors}
+        document.update(self.meta)
+        return document
+
+    def to_json(self, indent: Optional[int] = None) -> str:
+        if self.text is not None:
+            return self.text
+        return json.dumps(self.to_document(), indent=indent)
+
+    def summary_json(self) -> str:
+        """Only the fields the decider needs, as compact JSON"""
+        if not self.parsed:
+            return self.to_json()
+        return json.dumps([
+            {'path': f.path, 'line': f.line, 'rule': f.check_id, 'message': f.message}
+            for f in self.results
+        ], separators=(',', ':'), ensure_ascii=False)
+
+
+@dataclass
+class Task:
+    """One refactoring task; keys beyond file/reason/description are kept in `extra`"""
+    __slots__ = ('file', 'reason', 'description', 'extra')
+    file: str
+    reason: str
+    description: str
+    extra: Dict[str, Any]
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Task':
+        return cls(
+            file=data.get('file', ''),
+            reason=data.get('reason', ''),
+            description=data.get('description', ''),
+            extra={key: value for key, value in data.items() if key not in ('file', 'reason', 'description')},
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {'file': self.file, 'reason': self.reason, 'description': self.description}
+        data.update(self.extra)
+        return data
+
+
+@dataclass
+class TaskList:
+    """Tasks decided for a run; output that is not a JSON task list is kept as text"""
+    __slots__ = ('tasks', 'parsed', 'text')
+    tasks: List[Task]
+    parsed: bool
+    text: Optional[str]
+
+    @classmethod
+    def from_tasks(cls, tasks: List[Task]) -> 'TaskList':
+        return cls(tasks=list(tasks), parsed=True, text=None)
+
+    @classmethod
+    def parse(cls, text: str) -> 'TaskList':
+        """Parse a JSON task array (a single object counts as one task); blank means no tasks"""
+        if not text.strip():
+            return cls(tasks=[], parsed=True, text=None)
+        try:
+            data = json.loads(text)
+        except json.JSONDecodeError:
+            return cls(tasks=[], parsed=False, text=text)
+        if not isinstance(data, list):
+            data = [data]
+        if not all(isinstance(item, dict) for item in data):
+            return cls(tasks=[], parsed=False, text=text)
+        return cls(tasks=[Task.from_dict(item) for item in data], parsed=True, text=text)
+
+    def __len__(self) -> int:
+        return len(self.tasks)
+
+    def extend(self, tasks: List[Task]):
+        if not tasks:
+            return
+        self.tasks.extend(tasks)
+        if self.parsed:
+            self.text = None
+
+    def to_json(self) -> str:
+        tasks_json = json.dumps([task.to_dict() for task in self.tasks], indent=2, ensure_ascii=False)
+        if not self.parsed:
+            # Keep unparsed LLM output verbatim, with any local tasks as a separate list
+            return f"{self.text}\n\n{tasks_json}" if self.tasks else self.text
+        return self.text if self.text is not None else tasks_json
+
+
+@dataclass
+class PlannedFile:
+    """A file the generator plans to create"""
+    __slots__ = ('path', 'description')
+    path: str
+    description: str
+
+
+@dataclass
+class Plan:
+    """A project plan; top-level keys the generator does not use are kept in `extra`"""
+    __slots__ = ('project_name', 'description', 'tech_stack', 'root_files', 'directories',
+                 'runtime_dependencies', 'dev_dependencies', 'setup_commands', 'files', 'extra')
+    project_name: str
+    description: str
+    tech_stack: str
+    root_files: List[str]
+    directories: Dict[str, List[str]]
+    runtime_dependencies: List[str]
+    dev_dependencies: List[str]
+    setup_commands: List[str]
+    files: List[PlannedFile]
+    extra: Dict[str, Any]
+
+    KNOWN_KEYS = ('project_name', 'description', 'tech_stack', 'folder_structure', 'dependencies',
+                  'setup_commands', 'files_to_generate')
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Plan':
+        """Build a plan from parsed JSON, skipping malformed entries"""
+        folder_structure = data.get('folder_structure') or {}
+        dependencies = data.get('dependencies') or {}
+        return cls(
+            project_name=data.get('project_name', ''),
+            description=data.get('description', ''),
+            tech_stack=data.get('tech_stack', ''),
+            root_files=list(folder_structure.get('root_files', [])),
+            directories={name: list(files) for name, files in folder_structure.get('directories', {}).items()},
+            runtime_dependencies=list(dependencies.get('runtime', [])),
+            dev_dependencies=list(dependencies.get('dev', [])),
+            setup_commands=list(data.get('setup_commands', [])),
+            files=[PlannedFile(f['path'], f.get('description', ''))
+                   for f in data.get('files_to_generate', []) if isinstance(f, dict) and 'path' in f],
+            extra={key: value for key, value in data.items() if key not in cls.KNOWN_KEYS},
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {
+            'project_name': self.project_name,
+            'description': self.description,
+            'tech_stack': self.tech_stack,
+            'folder_structure': {'root_files': self.root_files, 'directories': self.directories},
+            'dependencies': {'runtime': self.runtime_dependencies, 'dev': self.dev_dependencies},
+            'setup_commands': self.setup_commands,
+            'files_to_generate': [{'path': f.path, 'description': f.description} for f in self.files],
+        }
+        data.update(self.extra)
+        return data
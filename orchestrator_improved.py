@@ -9,8 +9,22 @@ import argparse
 import sys
 import logging
 import re
+import os
+import math
+import time
+import threading
+import signal
+import tempfile
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Optional, List
+from typing import Optional, List, Tuple, Dict, Set
+
+from artifact_store import ArtifactStore, ArtifactStoreError
+from token_accounting import TokenAccountant, TokenBudgetExceeded
+from cassette import Cassette, CassetteError
+from profiling import StepProfiler
+from models import Finding, Findings, Task, TaskList
 
 # Optional tqdm for progress bar (graceful fallback)
 try:
@@ -20,6 +34,16 @@ except ImportError:
     TQDM_AVAILABLE = False
     tqdm = None
 
+# Optional watchdog for native file change events (inotify etc.), polling otherwise
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+    WATCHDOG_AVAILABLE = True
+except ImportError:
+    WATCHDOG_AVAILABLE = False
+    Observer = None
+    FileSystemEventHandler = None
+
 # Setup logging with UTF-8 encoding for Windows compatibility
 logging.basicConfig(
     level=logging.INFO,
@@ -42,6 +66,220 @@ class OrchestratorError(Exception):
     pass
 
 
+class CommandTimeout(OrchestratorError):
+    """Raised when an LLM command exceeds its adaptive timeout"""
+    pass
+
+
+# File extensions Semgrep can scan with the bundled rules, used for sharding
+SEMGREP_LANGUAGES = {
+    '.py': 'python',
+    '.js': 'javascript',
+    '.jsx': 'javascript',
+    '.mjs': 'javascript',
+    '.cjs': 'javascript',
+    '.ts': 'typescript',
+    '.tsx': 'typescript',
+    '.dart': 'dart',
+    '.cs': 'csharp',
+    '.go': 'go',
+    '.rs': 'rust',
+}
+
+# Directories skipped when the project is not a git checkout
+SEMGREP_SKIP_DIRS = {
+    '.git', 'node_modules', 'vendor', 'build', 'dist', 'bin', 'obj', 'target',
+    '.venv', 'venv', '.tox', '__pycache__', '.dart_tool',
+}
+
+# Watchdog event types that can change file contents; newer watchdog also reports opened/closed reads
+WATCH_EVENT_TYPES = {'created', 'modified', 'moved', 'deleted'}
+
+# Keep shard command lines below the Windows cmd.exe limit (8191 chars)
+SEMGREP_MAX_ARGS_CHARS = 7000
+
+
+class LatencyTracker:
+    """Rolling per-backend, per-step latency samples and hedge counters, persisted across runs"""
+
+    def __init__(self, stats_path: pathlib.Path, window: int = 100):
+        self.stats_path = stats_path
+        self.window = window
+        self.stats = self._load()
+        self.lock = threading.Lock()
+
+    def _load(self) -> Dict[str, dict]:
+        if not self.stats_path.exists():
+            return {}
+        try:
+            return json.loads(self.stats_path.read_text(encoding='utf-8'))
+        except json.JSONDecodeError:
+            logger.warning(f"Latency stats are corrupt, starting fresh: {self.stats_path}")
+            return {}
+
+    def _entry(self, key: str) -> dict:
+        return self.stats.setdefault(key, {'samples': [], 'hedges_fired': 0, 'hedges_won': 0, 'timeouts': 0})
+
+    def _save(self):
+        self.stats_path.write_text(json.dumps(self.stats, indent=2), encoding='utf-8')
+
+    def record(self, key: str, seconds: float, hedge_fired: bool = False, hedge_won: bool = False):
+        """Record a successful call and save the stats"""
+        with self.lock:
+            entry = self._entry(key)
+            entry['samples'] = (entry['samples'] + [round(seconds, 3)])[-self.window:]
+            entry['hedges_fired'] += int(hedge_fired)
+            entry['hedges_won'] += int(hedge_won)
+            self._save()
+
+    def record_timeout(self, key: str, seconds: float, hedge_fired: bool = False):
+        """Record a timed-out call, keeping its elapsed time as a (censored) sample"""
+        with self.lock:
+            entry = self._entry(key)
+            entry['samples'] = (entry['samples'] + [round(seconds, 3)])[-self.window:]
+            entry['timeouts'] += 1
+            entry['hedges_fired'] += int(hedge_fired)
+            self._save()
+
+    def percentile(self, key: str, q: float, min_samples: int = 1) -> Optional[float]:
+        """Nearest-rank percentile of the rolling window, None without enough samples"""
+        samples = sorted(self.stats.get(key, {}).get('samples', []))
+        if len(samples) < max(1, min_samples):
+            return None
+        rank = min(len(samples) - 1, max(0, math.ceil(q / 100 * len(samples)) - 1))
+        return samples[rank]
+
+    def summary(self) -> List[str]:
+        """One line per tracked call type"""
+        lines = []
+        for key in sorted(self.stats):
+            entry = self.stats[key]
+            p50, p95 = self.percentile(key, 50), self.percentile(key, 95)
+            if p50 is None:
+                continue
+            lines.append(f"{key}: n={len(entry['samples'])} p50={p50:.1f}s p95={p95:.1f}s "
+                         f"hedges fired={entry['hedges_fired']} won={entry['hedges_won']} "
+                         f"timeouts={entry['timeouts']}")
+        return lines
+
+
+class ProjectWatcher:
+    """Collect changed source files under a project root, debouncing bursts of edits"""
+
+    def __init__(self, project_root: pathlib.Path, poll_interval: float = 1.0):
+        self.project_root = project_root.resolve()
+        self.poll_interval = poll_interval
+        self._observer = None
+        self._events: Set[str] = set()
+        self._lock = threading.Lock()
+        self._snapshot: Dict[str, Tuple[int, int]] = {}
+
+    def _relative(self, path: str) -> Optional[str]:
+        """Map an absolute path to a scannable project-relative path, or None"""
+        try:
+            relative = pathlib.Path(path).resolve().relative_to(self.project_root)
+        except ValueError:
+            return None
+        if relative.suffix.lower() not in SEMGREP_LANGUAGES:
+            return None
+        if any(part in SEMGREP_SKIP_DIRS for part in relative.parts[:-1]):
+            return None
+        return relative.as_posix()
+
+    def _take_snapshot(self) -> Dict[str, Tuple[int, int]]:
+        """Map each scannable file to (mtime_ns, size)"""
+        snapshot = {}
+        stack = [str(self.project_root)]
+        while stack:
+            try:
+                entries = list(os.scandir(stack.pop()))
+            except OSError:
+                continue
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name not in SEMGREP_SKIP_DIRS:
+                        stack.append(entry.path)
+                elif pathlib.Path(entry.name).suffix.lower() in SEMGREP_LANGUAGES:
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    relative = pathlib.Path(entry.path).relative_to(self.project_root).as_posix()
+                    snapshot[relative] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+    def _file_state(self, relative: str) -> Optional[Tuple[int, int]]:
+        """(mtime_ns, size) of a project-relative file, None if it is gone"""
+        try:
+            stat = (self.project_root / relative).stat()
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _on_event(self, event):
+        if event.is_directory or event.event_type not in WATCH_EVENT_TYPES:
+            return
+        for path in (event.src_path, getattr(event, 'dest_path', None)):
+            relative = self._relative(path) if path else None
+            if relative:
+                with self._lock:
+                    self._events.add(relative)
+
+    def start(self):
+        """Start watching with native events if available, else by polling"""
+        # Both modes confirm changes against this snapshot, so reads never count as edits
+        self._snapshot = self._take_snapshot()
+        if WATCHDOG_AVAILABLE:
+            handler = FileSystemEventHandler()
+            handler.on_any_event = self._on_event
+            self._observer = Observer()
+            self._observer.schedule(handler, str(self.project_root), recursive=True)
+            self._observer.start()
+            logger.info("Watching for changes (native file events)")
+        else:
+            logger.info(f"Watching for changes (polling every {self.poll_interval}s)")
+
+    def stop(self):
+        if self._observer:
+            self._observer.stop()
+            self._observer.join()
+            self._observer = None
+
+    def _collect(self) -> Set[str]:
+        """Return files changed since the last call"""
+        if self._observer:
+            with self._lock:
+                events, self._events = self._events, set()
+            changed = set()
+            for path in events:
+                state = self._file_state(path)
+                if state != self._snapshot.get(path):
+                    changed.add(path)
+                    if state is None:
+                        self._snapshot.pop(path, None)
+                    else:
+                        self._snapshot[path] = state
+            return changed
+        snapshot = self._take_snapshot()
+        changed = {path for path in snapshot.keys() | self._snapshot.keys()
+                   if snapshot.get(path) != self._snapshot.get(path)}
+        self._snapshot = snapshot
+        return changed
+
+    def wait_for_changes(self, debounce: float) -> Set[str]:
+        """Block until files change, then until no further change for `debounce` seconds"""
+        pending: Set[str] = set()
+        last_change = 0.0
+        while True:
+            changed = self._collect()
+            if changed:
+                pending |= changed
+                last_change = time.monotonic()
+            elif pending and time.monotonic() - last_change >= debounce:
+                return pending
+            time.sleep(0.2 if self._observer else self.poll_interval)
+
+
 class Orchestrator:
     def __init__(self, config_path: str = "config.json"):
         """Initialize orchestrator with configuration"""
@@ -51,7 +289,23 @@ class Orchestrator:
         self.timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         self.steps_completed = 0
         self.total_steps = 5  # analysis, semgrep, decide, refactor, final_scan
+        self.artifact_store = self._open_artifact_store()
+        self.tokens = self._open_token_accountant()
+        self.cassette: Optional[Cassette] = None
+        self.profiler: Optional[StepProfiler] = None
+        latency = self.config.get('latency', {})
+        self.latency = LatencyTracker(self.output_dir / latency.get('stats_file', 'latency_stats.json'),
+                                      latency.get('window', 100))
     
+    def enable_profiling(self):
+        """Profile every pipeline step; steps are left unwrapped unless this is called"""
+        profiling = self.config.get('profiling', {})
+        self.profiler = StepProfiler(self.output_dir / f"{self.timestamp}_profile",
+                                     profiling.get('top_allocations', 10))
+        for name in ('step_analysis', 'step_semgrep', 'step_fast_path', 'step_decide',
+                     'step_refactor', 'step_final_scan'):
+            setattr(self, name, self.profiler.wrap(name[len('step_'):], getattr(self, name)))
+
     def _progress_bar(self, items: List, desc: str = "Processing"):
         """Create a progress bar if tqdm is available, otherwise return items as-is"""
         if TQDM_AVAILABLE and tqdm:
@@ -98,10 +352,10 @@ class Orchestrator:
         if not project_root.exists():
             raise OrchestratorError(f"Project root not found: {project_root}")
     
-    def _run_command(self, cmd: str, description: str) -> str:
-        """Run shell command with error handling"""
+    @staticmethod
+    def _execute(cmd: str) -> Tuple[str, int]:
+        """Run shell command and return (output, exit code)"""
         try:
-            logger.info(f"Running: {description}")
             result = subprocess.check_output(
                 cmd, 
                 shell=True, 
@@ -110,25 +364,415 @@ class Orchestrator:
                 errors='replace',
                 stderr=subprocess.STDOUT
             )
-            return result
+            return result, 0
         except subprocess.CalledProcessError as e:
+            return e.output, e.returncode
+
+    def _recorded(self, cmd: str, description: str, execute) -> Tuple[str, int]:
+        """Run `execute` through the cassette when recording or replaying"""
+        if not self.cassette:
+            return execute()
+        try:
+            return self.cassette.run(cmd, description, execute,
+                                     normalize=lambda text: text.replace(self.timestamp, '<timestamp>'))
+        except CassetteError as e:
+            raise OrchestratorError(f"Cassette error: {e}")
+
+    def _run_command(self, cmd: str, description: str) -> str:
+        """Run shell command with error handling"""
+        logger.info(f"Running: {description}")
+        output, exit_code = self._recorded(cmd, description, lambda: self._execute(cmd))
+        if exit_code != 0:
             logger.error(f"Command failed: {description}")
-            logger.error(f"Error: {e.output}")
-            raise OrchestratorError(f"Failed to execute: {description}") from e
+            logger.error(f"Error: {output}")
+            raise OrchestratorError(f"Failed to execute: {description}")
+        return output
     
+    def _start_command(self, cmd: str, stdout) -> subprocess.Popen:
+        """Start shell command in its own process group, writing output to `stdout`"""
+        return subprocess.Popen(
+            cmd,
+            shell=True,
+            stdout=stdout,
+            stderr=subprocess.STDOUT,
+            start_new_session=(sys.platform != 'win32')
+        )
+
+    @staticmethod
+    def _kill_process_tree(process: subprocess.Popen):
+        """Kill a started shell command together with the tools it spawned"""
+        if process.poll() is not None:
+            return
+        try:
+            if sys.platform == 'win32':
+                subprocess.run(['taskkill', '/F', '/T', '/PID', str(process.pid)],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            else:
+                os.killpg(process.pid, signal.SIGKILL)
+        except (OSError, subprocess.SubprocessError) as e:
+            logger.warning(f"Could not kill process {process.pid}: {e}")
+        process.wait()
+
+    def _run_tracked_command(self, cmd: str, description: str, backend: str, step: str) -> str:
+        """Run an LLM command, through the cassette when recording or replaying"""
+        if not self.cassette:
+            return self._run_adaptive_command(cmd, description, backend, step)
+
+        def execute() -> Tuple[str, int]:
+            try:
+                return self._run_adaptive_command(cmd, description, backend, step), 0
+            except OrchestratorError as e:
+                return str(e), 1
+
+        if self.cassette.mode == 'replay':
+            logger.info(f"Replaying: {description}")
+        output, exit_code = self._recorded(cmd, description, execute)
+        if exit_code != 0:
+            if self.cassette.mode == 'replay':
+                # A recorded run logged the failure itself; mirror it in this run's ledger
+                self.tokens.record_failure(step)
+            raise OrchestratorError(output)
+        return output
+
+    def _run_adaptive_command(self, cmd: str, description: str, backend: str, step: str) -> str:
+        """Run an LLM command with latency tracking, adaptive timeout and optional hedging"""
+        latency = self.config.get('latency', {})
+        policy = latency.get('steps', {}).get(step, {})
+        key = f"{backend}:{step}"
+        min_samples = latency.get('min_samples', 5)
+
+        # Adaptive timeout: a multiple of the observed p99, clamped; fixed/None until enough samples
+        timeout = policy.get('timeout')
+        max_timeout = policy.get('max_timeout', 3600)
+        p99 = self.latency.percentile(key, 99, min_samples)
+        if p99 is not None:
+            timeout = min(max(p99 * policy.get('timeout_factor', 3.0), policy.get('min_timeout', 60)), max_timeout)
+        # Codex edits the project in place, so running it twice at once is never safe
+        hedge_after = None
+        if policy.get('hedge', False) and backend != 'codex':
+            hedge_after = self.latency.percentile(key, 95, min_samples)
+
+        logger.info(f"Running: {description}" + (f" (timeout {timeout:.0f}s)" if timeout else "")
+                    + (f" (hedge after {hedge_after:.1f}s)" if hedge_after else ""))
+        try:
+            return self._run_attempts(cmd, description, key, step, timeout, hedge_after)
+        except CommandTimeout as e:
+            # A slow call is not a failed one: retry once with more room (never Codex, for the same reason)
+            if backend == 'codex':
+                self.tokens.record_failure(step, 'timeout')
+                raise
+            retry_timeout = max(timeout, min(timeout * 2, max_timeout))
+            logger.warning(f"{e}, retrying once with timeout {retry_timeout:.0f}s")
+            self.tokens.record_duplicate(step, 'timeout')
+        try:
+            return self._run_attempts(cmd, description, key, step, retry_timeout, None)
+        except CommandTimeout:
+            self.tokens.record_failure(step, 'timeout')
+            raise
+
+    def _run_attempts(self, cmd: str, description: str, key: str, step: str,
+                      timeout: Optional[float], hedge_after: Optional[float]) -> str:
+        """Run a command (plus a hedge after `hedge_after` seconds) until one succeeds or `timeout`"""
+        attempts = []  # (process, output file, start time)
+
+        def launch():
+            output = tempfile.TemporaryFile()
+            attempts.append((self._start_command(cmd, output), output, time.monotonic()))
+
+        launch()
+        started = attempts[0][2]
+        winner = None
+        failed = []
+        try:
+            while winner is None:
+                for attempt in attempts:
+                    process = attempt[0]
+                    if attempt in failed or process.poll() is None:
+                        continue
+                    if process.returncode == 0:
+                        winner = attempt
+                        break
+                    failed.append(attempt)
+                if winner is not None:
+                    break
+                if len(failed) == len(attempts):
+                    self.tokens.record_failure(step, 'failed')
+                    process, output, _ = failed[0]
+                    output.seek(0)
+                    logger.error(f"Command failed: {description}")
+                    logger.error(f"Error: {output.read().decode('utf-8', errors='replace')}")
+                    raise OrchestratorError(f"Failed to execute: {description}")
+
+                elapsed = time.monotonic() - started
+                if hedge_after is not None and len(attempts) == 1 and elapsed > hedge_after:
+                    logger.warning(f"{description} exceeded p95 ({hedge_after:.1f}s), starting hedge request")
+                    self.tokens.record_duplicate(step)
+                    launch()
+                if timeout and elapsed > timeout:
+                    # Censored sample: the call took at least this long, so p99 can grow to fit it
+                    self.latency.record_timeout(key, elapsed, hedge_fired=len(attempts) > 1)
+                    raise CommandTimeout(f"Timed out after {elapsed:.0f}s: {description}")
+                time.sleep(0.2)
+        finally:
+            for process, output, _ in attempts:
+                if winner is None or process is not winner[0]:
+                    self._kill_process_tree(process)
+                    output.close()
+
+        process, output, _ = winner
+        hedge_won = len(attempts) > 1 and process is attempts[1][0]
+        if hedge_won:
+            logger.info(f"Hedge request won for {description}")
+        # End-to-end latency as the caller saw it, measured from the original request
+        self.latency.record(key, time.monotonic() - started,
+                            hedge_fired=len(attempts) > 1, hedge_won=hedge_won)
+        output.seek(0)
+        result = output.read().decode('utf-8', errors='replace')
+        output.close()
+        return result
+
+    def _open_artifact_store(self) -> Optional[ArtifactStore]:
+        """Open the content-addressed artifact store if enabled in config"""
+        artifacts = self.config.get('artifacts', {})
+        if not artifacts.get('enabled', False):
+            return None
+        try:
+            return ArtifactStore(artifacts.get('dir', 'artifacts'), f"{self.timestamp}_orchestrator",
+                                 artifacts.get('codec', 'lzma'))
+        except ArtifactStoreError as e:
+            raise OrchestratorError(f"Invalid artifact store config: {e}")
+
     def _save_output(self, filename: str, content: str):
         """Save output to file with timestamp"""
+        if self.artifact_store:
+            digest = self.artifact_store.put(filename, content)
+            logger.info(f"Stored artifact: {filename} ({digest[:12]})")
+            return
         output_path = self.output_dir / f"{self.timestamp}_{filename}"
         output_path.write_text(content, encoding='utf-8')
         logger.info(f"Saved output to: {output_path}")
     
+    def _archive_prompt(self, prompt_file: pathlib.Path):
+        """Move a sent prompt file into the artifact store, if enabled"""
+        if self.artifact_store:
+            self._save_output(prompt_file.name[len(self.timestamp) + 1:], prompt_file.read_text(encoding='utf-8'))
+            prompt_file.unlink()
+    
+    def _open_token_accountant(self) -> TokenAccountant:
+        """Start token accounting for the current run"""
+        tokens = self.config.get('tokens', {})
+        return TokenAccountant(self.output_dir / tokens.get('ledger_file', 'token_ledger.json'),
+                               f"{self.timestamp}_orchestrator", tokens)
+
+    def _prepare_prompt(self, step: str, sections: Dict[str, str], render, downgraders=None) -> str:
+        """Render a prompt through token accounting, enforcing the step's budget"""
+        try:
+            return self.tokens.prepare(step, sections, render, downgraders)
+        except TokenBudgetExceeded as e:
+            raise OrchestratorError(f"Token budget exceeded: {e}")
+
     def _load_file(self, key_path: str) -> str:
         """Load content from file specified in config"""
         file_path = self.config
         for key in key_path.split('.'):
             file_path = file_path[key]
         return pathlib.Path(file_path).read_text(encoding='utf-8')
-    
+
+    def _semgrep_targets(self, project_root: pathlib.Path) -> List[Tuple[str, str, int]]:
+        """List scannable files, through the cassette so replayed shards match the recording"""
+        output, _ = self._recorded(f'git ls-files "{project_root}"', "Semgrep targets",
+                                   lambda: (json.dumps(self._list_targets(project_root)), 0))
+        return [tuple(target) for target in json.loads(output)]
+
+    @staticmethod
+    def _list_targets(project_root: pathlib.Path) -> List[Tuple[str, str, int]]:
+        """List scannable files as (relative path, language, size) tuples"""
+        try:
+            listing = subprocess.check_output(
+                ['git', 'ls-files', '--cached', '--others', '--exclude-standard'],
+                cwd=str(project_root),
+                text=True,
+                encoding='utf-8',
+                errors='replace',
+                stderr=subprocess.DEVNULL
+            )
+            candidates = [project_root / line for line in listing.splitlines() if line]
+        except (subprocess.CalledProcessError, OSError):
+            # Not a git checkout (or git missing): walk the tree ourselves
+            candidates = []
+            for dirpath, dirnames, filenames in os.walk(project_root):
+                dirnames[:] = [d for d in dirnames if d not in SEMGREP_SKIP_DIRS]
+                candidates.extend(pathlib.Path(dirpath) / name for name in filenames)
+
+        targets = []
+        for path in candidates:
+            language = SEMGREP_LANGUAGES.get(path.suffix.lower())
+            if not language or not path.is_file():
+                continue
+            targets.append((path.relative_to(project_root).as_posix(), language, path.stat().st_size))
+        return targets
+
+    @staticmethod
+    def _top_directory(path: str) -> str:
+        """Top-level directory of a project-relative path ('.' for files in the root)"""
+        return path.split('/', 1)[0] if '/' in path else '.'
+
+    @classmethod
+    def _shard_targets(cls, targets: List[Tuple[str, str, int]], shard_count: int) -> List[List[Tuple[str, str, int]]]:
+        """Split targets into shards of similar total size, keeping top-level directories together"""
+        shards = [[] for _ in range(max(1, min(shard_count, len(targets))))]
+        share = sum(size for _, _, size in targets) / len(shards)
+
+        # Each directory is one unit, so shard timings point at directories; only a
+        # directory bigger than one shard's share is split, so it can't become the straggler
+        by_directory: Dict[str, List[Tuple[str, str, int]]] = {}
+        for target in targets:
+            by_directory.setdefault(cls._top_directory(target[0]), []).append(target)
+        units = []
+        for directory in sorted(by_directory):
+            unit, unit_size = [], 0
+            for target in sorted(by_directory[directory], key=lambda t: (-t[2], t[0])):
+                if unit and unit_size + target[2] > share:
+                    units.append(unit)
+                    unit, unit_size = [], 0
+                unit.append(target)
+                unit_size += target[2]
+            units.append(unit)
+
+        loads = [0] * len(shards)
+        languages = [set() for _ in shards]
+        # Largest units first: greedy longest-processing-time assignment, keeping languages together on ties
+        for unit in sorted(units, key=lambda u: -sum(size for _, _, size in u)):
+            unit_languages = {language for _, language, _ in unit}
+            index = min(range(len(shards)), key=lambda i: (loads[i], not unit_languages & languages[i]))
+            shards[index].extend(unit)
+            loads[index] += sum(size for _, _, size in unit)
+            languages[index] |= unit_languages
+        return [shard for shard in shards if shard]
+
+    @staticmethod
+    def _merge_semgrep_results(documents: List[dict]) -> dict:
+        """Merge several Semgrep JSON documents into one with the same shape"""
+        def merge(into: dict, other: dict):
+            for key, value in other.items():
+                if key not in into:
+                    into[key] = value
+                elif isinstance(into[key], list) and isinstance(value, list):
+                    into[key].extend(value)
+                elif isinstance(into[key], dict) and isinstance(value, dict):
+                    merge(into[key], value)
+                elif isinstance(into[key], (int, float)) and isinstance(value, (int, float)) \
+                        and not isinstance(value, bool):
+                    into[key] += value
+
+        merged = {'results': [], 'errors': []}
+        for document in documents:
+            merge(merged, document)
+        return merged
+
+    def _run_semgrep_shard(self, index: int, shard: List[Tuple[str, str, int]], semgrep_config: str,
+                           project_root: str, jobs_per_process: int, run_label: str) -> Tuple[dict, dict]:
+        """Run Semgrep on one shard and return (parsed output, timing record)"""
+        # Split long shards into batches so the command line stays within limits
+        batches, batch, length = [], [], 0
+        for path, _, _ in shard:
+            if batch and length + len(path) + 3 > SEMGREP_MAX_ARGS_CHARS:
+                batches.append(batch)
+                batch, length = [], 0
+            batch.append(path)
+            length += len(path) + 3
+        if batch:
+            batches.append(batch)
+
+        documents = []
+        started = time.perf_counter()
+        for batch_index, batch in enumerate(batches):
+            output_file = self.output_dir / f"{self.timestamp}_{run_label}_shard{index}_{batch_index}.json"
+            targets = ' '.join(f'"{path}"' for path in batch)
+            cmd = (f'cd "{project_root}" && semgrep --config="{semgrep_config}" --json '
+                   f'--jobs {jobs_per_process} --output "{output_file.absolute()}" {targets}')
+            try:
+                self._run_command(cmd, f"Semgrep shard {index + 1} ({len(batch)} files)")
+                documents.append(json.loads(output_file.read_text(encoding='utf-8')))
+            except (OrchestratorError, OSError, json.JSONDecodeError) as e:
+                documents.append({'errors': [{'type': 'ShardError', 'level': 'error',
+                                              'message': f"Shard {index + 1} batch {batch_index + 1}: {e}"}]})
+            finally:
+                if output_file.exists():
+                    output_file.unlink()
+        elapsed = time.perf_counter() - started
+
+        timing = {
+            'shard': index + 1,
+            'files': len(shard),
+            'bytes': sum(size for _, _, size in shard),
+            'languages': sorted({language for _, language, _ in shard}),
+            'directories': sorted({self._top_directory(path) for path, _, _ in shard}),
+            'batches': len(batches),
+            'failed_batches': sum(1 for document in documents if 'results' not in document),
+            'elapsed_seconds': round(elapsed, 3),
+        }
+        return self._merge_semgrep_results(documents), timing
+
+    @staticmethod
+    def _check_shard_failures(timings: List[dict], description: str):
+        """Raise when every Semgrep batch failed, warn when only some did"""
+        failed = sum(timing['failed_batches'] for timing in timings)
+        if not failed:
+            return
+        total = sum(timing['batches'] for timing in timings)
+        if failed == total:
+            raise OrchestratorError(f"Failed to execute: {description} (all {total} Semgrep batch(es) failed)")
+        logger.warning(f"{description}: {failed} of {total} Semgrep batch(es) failed, "
+                       f"results are incomplete (see ShardError entries in errors)")
+
+    def _run_semgrep(self, description: str, run_label: str, extra_args: str = '') -> Findings:
+        """Run Semgrep over project_root, sharded across processes when semgrep.jobs > 1"""
+        semgrep_config = pathlib.Path(self.config['semgrep']['config']).absolute()
+        project_root = self.config['project_root']
+        jobs = int(self.config['semgrep'].get('jobs', 1))
+
+        if jobs <= 1:
+            # JSON goes to a file: stdout also carries stderr (progress, --verbose logs)
+            output_file = self.output_dir / f"{self.timestamp}_{run_label}_output.json"
+            cmd = (f'cd "{project_root}" && semgrep --config="{semgrep_config}" --json{extra_args} '
+                   f'--output "{output_file.absolute()}"')
+            try:
+                self._run_command(cmd, description)
+                return Findings.parse(output_file.read_text(encoding='utf-8'))
+            except OSError as e:
+                raise OrchestratorError(f"Failed to read Semgrep output: {e}")
+            finally:
+                if output_file.exists():
+                    output_file.unlink()
+
+        targets = self._semgrep_targets(pathlib.Path(project_root))
+        shards = self._shard_targets(targets, int(self.config['semgrep'].get('shards', jobs)))
+        if not shards:
+            logger.info("No files to scan")
+            return Findings.from_document(self._merge_semgrep_results([]))
+
+        jobs = min(jobs, len(shards))
+        jobs_per_process = max(1, (os.cpu_count() or 1) // jobs)
+        logger.info(f"Running: {description} ({len(targets)} files in {len(shards)} shard(s), {jobs} parallel job(s))")
+
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            futures = [
+                executor.submit(self._run_semgrep_shard, index, shard, str(semgrep_config),
+                                project_root, jobs_per_process, run_label)
+                for index, shard in enumerate(shards)
+            ]
+            outcomes = [future.result() for future in futures]
+
+        timings = sorted((timing for _, timing in outcomes), key=lambda t: -t['elapsed_seconds'])
+        for timing in timings:
+            logger.info(f"  Shard {timing['shard']}: {timing['elapsed_seconds']:.1f}s, "
+                        f"{timing['files']} files, {', '.join(timing['directories'][:5])}")
+        self._save_output(f"{run_label}_shard_timing.json", json.dumps(timings, indent=2))
+        self._check_shard_failures(timings, description)
+
+        return Findings.from_document(self._merge_semgrep_results([document for document, _ in outcomes]))
+
     def step_analysis(self) -> str:
         """Step 1: Project analysis with Gemini"""
         if not self.config['steps'].get('analysis', True):
@@ -144,60 +788,181 @@ class Orchestrator:
         
         # Create temp prompt file to avoid shell escaping issues
         prompt_file = self.output_dir / f"{self.timestamp}_analysis_prompt.txt"
-        prompt_content = f"""Project Root: {project_root}
+        prompt_content = self._prepare_prompt(
+            'analysis',
+            {'system': system, 'goal': goal, 'constraints': constraints},
+            lambda sections: f"""Project Root: {project_root}
 
-{system}
+{sections['system']}
 
 Goal:
-{goal}
+{sections['goal']}
 
 Constraints:
-{constraints}
+{sections['constraints']}
 
 IMPORTANT: Analyze the project at {project_root}.
 Provide a detailed, actionable refactor plan.
 Format your response as clear text or markdown."""
+        )
         prompt_file.write_text(prompt_content, encoding='utf-8')
         
         # Use absolute path for Windows and PowerShell Get-Content
         prompt_file_abs = str(prompt_file.absolute())
         cmd = f'cd "{project_root}" && powershell -Command "Get-Content \'{prompt_file_abs}\' | gemini -p -"'
-        analysis = self._run_command(cmd, "Gemini analysis")
+        analysis = self._run_tracked_command(cmd, "Gemini analysis", "gemini", "analysis")
+        self.tokens.record_output('analysis', analysis)
+        self._archive_prompt(prompt_file)
         self._save_output("analysis.txt", analysis)
         return analysis
     
-    def step_semgrep(self) -> str:
+    def step_semgrep(self) -> Findings:
         """Step 2: Static analysis with Semgrep"""
         if not self.config['steps'].get('semgrep', True):
             logger.info("Skipping semgrep step")
-            return ""
+            return Findings.parse("")
         
         logger.info("[SEMGREP] Static analysis")
         
-        semgrep_config = self.config['semgrep']['config']
-        project_root = self.config['project_root']
-        
         # Run semgrep on the target project
-        cmd = f'cd "{project_root}" && semgrep --config="{pathlib.Path(semgrep_config).absolute()}" --json --verbose'
-        
-        findings = self._run_command(cmd, "Semgrep scan")
-        self._save_output("semgrep_findings.json", findings)
+        findings = self._run_semgrep("Semgrep scan", "semgrep", extra_args=' --verbose')
+        self._save_output("semgrep_findings.json", findings.to_json(indent=2))
         
-        # Parse and log summary
-        try:
-            findings_data = json.loads(findings)
-            results = findings_data.get('results', [])
-            logger.info(f"Semgrep found {len(results)} issue(s)")
-        except json.JSONDecodeError:
+        # Log summary
+        if findings.parsed:
+            logger.info(f"Semgrep found {len(findings.results)} issue(s)")
+        else:
             logger.warning("Could not parse Semgrep output")
         
         return findings
     
-    def step_decide(self, analysis: str, findings: str) -> str:
+    @staticmethod
+    def _position_matches(data: bytes, position: dict) -> bool:
+        """Check that a Semgrep offset still points at its reported line and column"""
+        offset = position.get('offset')
+        if offset is None or offset > len(data):
+            return False
+        line_start = data.rfind(b'\n', 0, offset) + 1
+        column = len(data[line_start:offset].decode('utf-8', errors='replace')) + 1
+        return data.count(b'\n', 0, offset) + 1 == position.get('line') and column == position.get('col')
+
+    def _load_match_code(self, findings: List[Finding]):
+        """Fill in each finding's matched source from the file (Semgrep's `lines` may be a placeholder)"""
+        project_root = pathlib.Path(self.config['project_root'])
+        by_path: Dict[str, List[Finding]] = {}
+        for finding in findings:
+            by_path.setdefault(finding.path, []).append(finding)
+        for path, file_findings in by_path.items():
+            try:
+                data = (project_root / path).read_bytes()
+            except OSError:
+                continue
+            for finding in file_findings:
+                start, end = finding.raw.get('start', {}), finding.raw.get('end', {})
+                if 'offset' in start and 'offset' in end:
+                    finding.code = data[start['offset']:end['offset']].decode('utf-8', errors='replace')
+
+    def _apply_autofixes(self, findings: List[Finding]) -> List[Finding]:
+        """Apply Semgrep `fix` replacements locally and return the findings that were fixed"""
+        project_root = pathlib.Path(self.config['project_root'])
+        by_path: Dict[str, List[Finding]] = {}
+        for finding in findings:
+            by_path.setdefault(finding.path, []).append(finding)
+
+        fixed = []
+        for path, file_findings in by_path.items():
+            file_path = project_root / path
+            try:
+                data = file_path.read_bytes()
+            except OSError as e:
+                logger.warning(f"Cannot autofix {path}: {e}")
+                continue
+            # Apply from the end of the file so earlier offsets stay valid; skip overlaps
+            next_start = len(data) + 1
+            for finding in sorted(file_findings, key=lambda f: f.raw['start']['offset'], reverse=True):
+                result = finding.raw
+                start, end = result['start']['offset'], result['end']['offset']
+                # Skip overlaps, empty matches and findings the file has moved away from since the scan
+                if end > next_start or end <= start or not (self._position_matches(data, result['start'])
+                                                            and self._position_matches(data, result['end'])):
+                    continue
+                data = data[:start] + result['extra']['fix'].encode('utf-8') + data[end:]
+                next_start = start
+                fixed.append(finding)
+            if any(f.path == path for f in fixed):
+                file_path.write_bytes(data)
+        return fixed
+
+    def step_fast_path(self, findings: Findings) -> Tuple[Findings, List[Task], int]:
+        """Autofix and turn allow-listed findings into tasks without an LLM round trip
+
+        Returns the findings left for Gemini, the generated tasks and the number of handled findings.
+        """
+        fast_path = self.config.get('fast_path', {})
+        if not fast_path.get('enabled', False) or not findings.parsed:
+            return findings, [], 0
+
+        logger.info("[FAST PATH] Handling mechanical findings locally")
+        rules = fast_path.get('rules', {})
+        results = findings.results
+
+        # Autofixes edit the project, so a dry run (refactor disabled) leaves them to the normal path
+        apply_autofix = fast_path.get('apply_autofix', True) and self.config['steps'].get('refactor', True)
+        fixable = [f for f in results if apply_autofix and f.raw.get('extra', {}).get('fix')]
+        if fixable and self.cassette and self.cassette.mode == 'replay':
+            # Replay must not touch the project; treat fixes as applied, as in the recorded run
+            logger.info(f"Replay: not writing {len(fixable)} autofix(es) to the project")
+            fixed = fixable
+        else:
+            fixed = self._apply_autofixes(fixable) if fixable else []
+        fixed_ids = {id(f) for f in fixed}
+
+        grouped: Dict[Tuple[str, str], List[Finding]] = {}
+        remaining = []
+        for finding in results:
+            if id(finding) in fixed_ids:
+                continue
+            if finding.rule in rules:
+                grouped.setdefault((finding.path, finding.rule), []).append(finding)
+            else:
+                remaining.append(finding)
+
+        tasks = []
+        for (path, rule), rule_findings in sorted(grouped.items()):
+            lines = ', '.join(str(f.line) for f in rule_findings)
+            tasks.append(Task.from_dict({
+                'file': path,
+                'reason': rules[rule].get('reason', rule_findings[0].message or rule),
+                'description': f"{rules[rule]['description']} (line {lines})",
+            }))
+
+        handled = len(results) - len(remaining)
+        logger.info(f"Fast path: {len(fixed)} autofixed, {handled - len(fixed)} turned into "
+                    f"{len(tasks)} task(s), {len(remaining)} left for Gemini")
+        if tasks:
+            self._save_output("fast_path_tasks.json", TaskList.from_tasks(tasks).to_json())
+        if not handled:
+            return findings, tasks, handled
+        return findings.replace_results(remaining), tasks, handled
+
+    def _decide_tasks(self, analysis: str, findings: Findings) -> TaskList:
+        """Run the fast path, then ask Gemini only about what is left"""
+        findings, fast_tasks, handled = self.step_fast_path(findings)
+        if handled and not analysis and not findings.results:
+            logger.info("All findings handled by the fast path, skipping Gemini decision")
+            tasks = TaskList.from_tasks([])
+        else:
+            tasks = self.step_decide(analysis, findings)
+        if fast_tasks and not tasks.parsed:
+            logger.warning("Decided tasks are not valid JSON, appending fast path tasks as a separate list")
+        tasks.extend(fast_tasks)
+        return tasks
+
+    def step_decide(self, analysis: str, findings: Findings) -> TaskList:
         """Step 3: Decide actionable tasks with Gemini"""
         if not self.config['steps'].get('decide', True):
             logger.info("Skipping decision step")
-            return ""
+            return TaskList.from_tasks([])
         
         logger.info("[GEMINI] Deciding actionable tasks")
         
@@ -205,57 +970,58 @@ Format your response as clear text or markdown."""
         constraints = self._load_file('files.constraints')
         project_root = self.config['project_root']
         
-        # Parse semgrep findings count
-        findings_count = 0
-        try:
-            findings_data = json.loads(findings)
-            findings_count = len(findings_data.get('results', []))
-        except (json.JSONDecodeError, KeyError, TypeError):
-            pass
+        findings_count = len(findings.results)
         
         # Create temp prompt file
         prompt_file = self.output_dir / f"{self.timestamp}_decide_prompt.txt"
-        prompt_content = f"""{decider}
+        prompt_content = self._prepare_prompt(
+            'decide',
+            {'decider': decider, 'analysis': analysis, 'findings': findings.to_json(), 'constraints': constraints},
+            lambda sections: f"""{sections['decider']}
 
 Project Root: {project_root}
 
 Analysis:
-{analysis}
+{sections['analysis']}
 
 Semgrep findings ({findings_count} issues):
-{findings}
+{sections['findings']}
 
 Constraints:
-{constraints}
+{sections['constraints']}
 
 IMPORTANT: Output ONLY a valid JSON array of tasks.
 Each task must have: file (path), reason (string), description (string)
 Example: [{{"file": "src/main.py", "reason": "Too complex", "description": "Split into smaller functions"}}]
-If no tasks, return: []"""
+If no tasks, return: []""",
+            downgraders={'findings': lambda _: findings.summary_json()}
+        )
         prompt_file.write_text(prompt_content, encoding='utf-8')
         
         # Use absolute path for Windows and PowerShell
         prompt_file_abs = str(prompt_file.absolute())
         cmd = f'cd "{project_root}" && powershell -Command "Get-Content \'{prompt_file_abs}\' | gemini -p -"'
-        tasks = self._run_command(cmd, "Gemini decision")
-        self._save_output("tasks.json", tasks)
+        output = self._run_tracked_command(cmd, "Gemini decision", "gemini", "decide")
+        self.tokens.record_output('decide', output)
+        self._archive_prompt(prompt_file)
+        self._save_output("tasks.json", output)
         
-        # Validate JSON output
-        try:
-            tasks_data = json.loads(tasks)
-            logger.info(f"Generated {len(tasks_data)} task(s)")
-        except json.JSONDecodeError:
+        # Parse the task list once; later steps use the parsed tasks
+        tasks = TaskList.parse(output)
+        if tasks.parsed:
+            logger.info(f"Generated {len(tasks)} task(s)")
+        else:
             logger.warning("Tasks output is not valid JSON, attempting to extract...")
             # Try to extract JSON from markdown code blocks
-            import re
-            json_match = re.search(r'```(?:json)?\s*([\s\S]*?)```', tasks)
+            json_match = re.search(r'```(?:json)?\s*([\s\S]*?)```', output)
             if json_match:
-                tasks = json_match.group(1).strip()
-                self._save_output("tasks_extracted.json", tasks)
+                extracted = json_match.group(1).strip()
+                self._save_output("tasks_extracted.json", extracted)
+                tasks = TaskList.parse(extracted)
         
         return tasks
     
-    def step_refactor(self, tasks: str):
+    def step_refactor(self, tasks: TaskList):
         """Step 4: Apply refactors with Codex"""
         if not self.config['steps'].get('refactor', True):
             logger.info("Skipping refactor step")
@@ -264,29 +1030,32 @@ If no tasks, return: []"""
         logger.info("[CODEX] Applying refactors")
         
         # Validate tasks first
-        try:
-            tasks_data = json.loads(tasks)
-            if not tasks_data or len(tasks_data) == 0:
-                logger.info("No tasks to refactor, skipping Codex step")
-                return
-            logger.info(f"Applying {len(tasks_data)} refactoring task(s)")
-        except json.JSONDecodeError:
+        if not tasks.parsed:
             logger.warning("Tasks are not valid JSON, attempting refactor anyway...")
+        elif not tasks:
+            logger.info("No tasks to refactor, skipping Codex step")
+            return
+        else:
+            logger.info(f"Applying {len(tasks)} refactoring task(s)")
         
         codex_prompt = self._load_file('prompts.codex')
         project_root = self.config['project_root']
         
         # Create temp prompt file
         prompt_file = self.output_dir / f"{self.timestamp}_refactor_prompt.txt"
-        prompt_content = f"""{codex_prompt}
+        prompt_content = self._prepare_prompt(
+            'refactor',
+            {'codex': codex_prompt, 'tasks': tasks.to_json()},
+            lambda sections: f"""{sections['codex']}
 
 Project Root: {project_root}
 
 Tasks to implement:
-{tasks}
+{sections['tasks']}
 
 IMPORTANT: Apply these refactorings to the codebase.
 Work in the directory: {project_root}"""
+        )
         prompt_file.write_text(prompt_content, encoding='utf-8')
         
         # Use absolute path for Windows and PowerShell
@@ -294,7 +1063,9 @@ Work in the directory: {project_root}"""
         cmd = f'cd "{project_root}" && powershell -Command "Get-Content \'{prompt_file_abs}\' | codex exec --dangerously-bypass-approvals-and-sandbox"'
         
         try:
-            result = self._run_command(cmd, "Codex refactoring")
+            result = self._run_tracked_command(cmd, "Codex refactoring", "codex", "refactor")
+            self.tokens.record_output('refactor', result)
+            self._archive_prompt(prompt_file)
             self._save_output("codex_result.txt", result)
         except OrchestratorError as e:
             logger.error(f"Codex refactoring failed, but continuing...")
@@ -308,25 +1079,144 @@ Work in the directory: {project_root}"""
         
         logger.info("[SEMGREP] Final scan")
         
-        semgrep_config = self.config['semgrep']['config']
-        project_root = self.config['project_root']
-        
-        cmd = f'cd "{project_root}" && semgrep --config="{pathlib.Path(semgrep_config).absolute()}" --json'
-        
         try:
-            result = self._run_command(cmd, "Final Semgrep scan")
-            self._save_output("final_scan.txt", result)
+            result = self._run_semgrep("Final Semgrep scan", "final_scan")
+            self._save_output("final_scan.txt", result.to_json(indent=2))
             
             # Compare with initial scan
-            try:
-                final_data = json.loads(result)
-                final_count = len(final_data.get('results', []))
-                logger.info(f"Final scan: {final_count} issue(s) remaining")
-            except (json.JSONDecodeError, KeyError, TypeError):
-                pass
+            if result.parsed:
+                logger.info(f"Final scan: {len(result.results)} issue(s) remaining")
         except OrchestratorError:
             logger.warning("Final scan found issues or failed")
     
+    @staticmethod
+    def _findings_by_file(findings: Findings) -> Dict[str, List[Finding]]:
+        """Group Semgrep findings by project-relative path"""
+        grouped: Dict[str, List[Finding]] = {}
+        if not findings.parsed:
+            logger.warning("Could not parse Semgrep output")
+        for finding in findings.results:
+            grouped.setdefault(finding.path, []).append(finding)
+        return grouped
+
+    @staticmethod
+    def _finding_fingerprints(findings: List[Finding]) -> Counter:
+        """Fingerprint findings independently of line numbers so edits elsewhere don't count"""
+        return Counter(finding.fingerprint for finding in findings)
+
+    def _run_incremental(self, analysis: str, changed: Set[str], findings_state: Dict[str, List[Finding]]):
+        """Rescan changed files and decide/refactor only those with new findings"""
+        self.timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.artifact_store = self._open_artifact_store()
+        self.tokens = self._open_token_accountant()
+        project_root = pathlib.Path(self.config['project_root'])
+        logger.info(f"[WATCH] {len(changed)} file(s) changed")
+
+        targets = []
+        for path in sorted(changed):
+            file_path = project_root / path
+            if file_path.is_file():
+                targets.append((path, SEMGREP_LANGUAGES[file_path.suffix.lower()], file_path.stat().st_size))
+
+        scan = {'results': [], 'errors': []}
+        if targets:
+            semgrep_config = str(pathlib.Path(self.config['semgrep']['config']).absolute())
+            scan, timing = self._run_semgrep_shard(0, targets, semgrep_config, str(project_root),
+                                                   os.cpu_count() or 1, "watch")
+            self._check_shard_failures([timing], "Semgrep rescan")
+        scan = Findings.from_document(scan)
+        self._load_match_code(scan.results)
+        rescanned = self._findings_by_file(scan)
+
+        affected = []
+        for path in changed:
+            previous = findings_state.pop(path, [])
+            current = rescanned.get(path, [])
+            if current:
+                findings_state[path] = current
+            if self._finding_fingerprints(current) - self._finding_fingerprints(previous):
+                affected.append(path)
+
+        if not affected:
+            logger.info("[WATCH] No new findings, nothing to do")
+            return
+
+        logger.info(f"[WATCH] New findings in {len(affected)} file(s): {', '.join(sorted(affected))}")
+        findings = scan.replace_results([finding for path in sorted(affected) for finding in rescanned[path]])
+        self._save_output("semgrep_findings.json", findings.to_json(indent=2))
+        tasks = self._tasks_for_files(self._decide_tasks(analysis, findings), set(affected))
+        self.step_refactor(tasks)
+
+    def _tasks_for_files(self, tasks: TaskList, paths: Set[str]) -> TaskList:
+        """Keep only tasks for the given project-relative paths"""
+        if not tasks.parsed:
+            # Without parsed tasks there is no way to keep Codex away from untouched files
+            logger.warning("Tasks are not valid JSON, skipping refactor for this change")
+            return TaskList.from_tasks([])
+        project_root = pathlib.Path(self.config['project_root']).absolute()
+        kept = []
+        for task in tasks.tasks:
+            path = pathlib.Path(task.file.replace('\\', '/'))
+            if path.is_absolute():
+                try:
+                    path = path.relative_to(project_root)
+                except ValueError:
+                    pass
+            if pathlib.PurePosixPath(path.as_posix()).as_posix() in paths:
+                kept.append(task)
+        if len(kept) < len(tasks):
+            logger.info(f"[WATCH] Dropped {len(tasks) - len(kept)} task(s) for files without new findings")
+        return TaskList.from_tasks(kept)
+
+    def watch(self):
+        """Run continuously, reprocessing only what changed under project_root"""
+        watcher = None
+        try:
+            logger.info("=" * 50)
+            logger.info("Starting AI Orchestrator (watch mode)")
+            logger.info("=" * 50)
+
+            self._validate_files()
+            if not self.config['steps'].get('semgrep', True):
+                raise OrchestratorError("Watch mode requires the semgrep step")
+
+            watch_config = self.config.get('watch', {})
+            analysis = self.step_analysis()
+
+            # Baseline scan: only findings that appear after this point trigger work
+            logger.info("[SEMGREP] Baseline scan")
+            baseline = self._run_semgrep("Semgrep baseline scan", "semgrep")
+            self._save_output("semgrep_findings.json", baseline.to_json(indent=2))
+            self._load_match_code(baseline.results)
+            findings_state = self._findings_by_file(baseline)
+            logger.info(f"Baseline: {sum(len(r) for r in findings_state.values())} issue(s) "
+                        f"in {len(findings_state)} file(s)")
+
+            watcher = ProjectWatcher(pathlib.Path(self.config['project_root']),
+                                     watch_config.get('poll_interval', 1.0))
+            watcher.start()
+            logger.info("Press Ctrl+C to stop")
+            while True:
+                changed = watcher.wait_for_changes(watch_config.get('debounce', 2.0))
+                try:
+                    self._run_incremental(analysis, changed, findings_state)
+                except OrchestratorError as e:
+                    logger.error(f"Incremental run failed: {e}")
+
+        except OrchestratorError as e:
+            logger.error(f"Orchestration failed: {e}")
+            sys.exit(1)
+        except KeyboardInterrupt:
+            logger.info("Watch mode stopped by user")
+        except Exception as e:
+            logger.error(f"Unexpected error: {e}", exc_info=True)
+            sys.exit(1)
+        finally:
+            if watcher:
+                watcher.stop()
+            if self.profiler:
+                self.profiler.write_summary()
+
     def run(self):
         """Run the complete orchestration pipeline"""
         try:
@@ -344,7 +1234,7 @@ Work in the directory: {project_root}"""
             findings = self.step_semgrep()
             self._update_progress("Semgrep")
             
-            tasks = self.step_decide(analysis, findings)
+            tasks = self._decide_tasks(analysis, findings)
             self._update_progress("Decision")
             
             self.step_refactor(tasks)
@@ -356,6 +1246,10 @@ Work in the directory: {project_root}"""
             logger.info("=" * 50)
             logger.info("SUCCESS: Orchestration completed")
             logger.info(f"Results saved in: {self.output_dir}")
+            for line in self.latency.summary():
+                logger.info(f"  Latency {line}")
+            for line in self.tokens.summary():
+                logger.info(f"  Tokens {line}")
             logger.info("=" * 50)
             
         except OrchestratorError as e:
@@ -367,6 +1261,9 @@ Work in the directory: {project_root}"""
         except Exception as e:
             logger.error(f"Unexpected error: {e}", exc_info=True)
             sys.exit(1)
+        finally:
+            if self.profiler:
+                self.profiler.write_summary()
 
 
 def main():
@@ -394,6 +1291,38 @@ def main():
         action='store_true',
         help='Skip Codex refactoring (dry run)'
     )
+    parser.add_argument(
+        '--semgrep-jobs',
+        type=int,
+        metavar='N',
+        help='Run Semgrep as N parallel sharded processes (overrides semgrep.jobs)'
+    )
+    parser.add_argument(
+        '--watch',
+        action='store_true',
+        help='Keep running and reprocess changed files incrementally'
+    )
+    parser.add_argument(
+        '--record-cassette',
+        metavar='PATH',
+        help='Record every external tool call (output, exit code, latency) to a cassette file'
+    )
+    parser.add_argument(
+        '--replay-cassette',
+        metavar='PATH',
+        help='Replay tool calls from a cassette file instead of running the tools'
+    )
+    parser.add_argument(
+        '--replay-timing',
+        choices=['instant', 'original'],
+        default='instant',
+        help='Replay recorded calls instantly or with their original latency (default: instant)'
+    )
+    parser.add_argument(
+        '--profile',
+        action='store_true',
+        help='Write per-step memory peaks, allocation sites and cProfile dumps to output_dir'
+    )
     parser.add_argument(
         '--dry-run',
         action='store_true',
@@ -411,12 +1340,30 @@ def main():
     if args.skip_semgrep:
         orchestrator.config['steps']['semgrep'] = False
         orchestrator.config['steps']['final_scan'] = False
+    if args.semgrep_jobs is not None:
+        orchestrator.config['semgrep']['jobs'] = args.semgrep_jobs
     if args.skip_refactor or args.dry_run:
         orchestrator.config['steps']['refactor'] = False
         orchestrator.config['steps']['final_scan'] = False
+    if args.profile:
+        orchestrator.enable_profiling()
+    
+    if args.record_cassette and args.replay_cassette:
+        parser.error('--record-cassette and --replay-cassette are mutually exclusive')
+    try:
+        if args.record_cassette:
+            orchestrator.cassette = Cassette.open(args.record_cassette, 'record')
+        elif args.replay_cassette:
+            orchestrator.cassette = Cassette.open(args.replay_cassette, 'replay', args.replay_timing)
+    except CassetteError as e:
+        logger.error(str(e))
+        sys.exit(1)
     
     # Run
-    orchestrator.run()
+    if args.watch:
+        orchestrator.watch()
+    else:
+        orchestrator.run()
 
 
 if __name__ == "__main__":
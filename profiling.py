@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Profiling - Per-step memory and CPU profiles for the pipelines
+"""
+import cProfile
+import functools
+import json
+import logging
+import pathlib
+import sys
+import threading
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+# resource is POSIX only; psutil is an optional fallback (e.g. on Windows)
+try:
+    import resource
+except ImportError:
+    resource = None
+
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+    psutil = None
+
+logger = logging.getLogger(__name__)
+
+# tracemalloc and cProfile are process-wide, so only one step is profiled at a time
+_PROFILE_LOCK = threading.Lock()
+
+MB = 1024 * 1024
+
+# Seconds between RSS samples while a step runs
+SAMPLE_INTERVAL = 0.05
+
+
+def _max_rss() -> Dict[str, Optional[float]]:
+    """High-water RSS (MB) since process start of this process and its largest finished child"""
+    if resource is None:
+        return {'self': None, 'children': None}
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    scale = 1 if sys.platform == 'darwin' else 1024
+    return {
+        'self': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / MB,
+        'children': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale / MB,
+    }
+
+
+class _RssSampler:
+    """Samples the RSS of this process and its live children in a background thread (needs psutil)"""
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL):
+        self.interval = interval
+        self.peak_self = 0
+        self.peak_children = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name='rss-sampler', daemon=True)
+        self._process = psutil.Process()
+
+    def _sample(self):
+        self.peak_self = max(self.peak_self, self._process.memory_info().rss)
+        total = 0
+        for child in self._process.children(recursive=True):
+            try:
+                total += child.memory_info().rss
+            except psutil.Error:
+                pass  # exited between listing and sampling
+        self.peak_children = max(self.peak_children, total)
+
+    def _loop(self):
+        while True:
+            self._sample()
+            if self._stop.wait(self.interval):
+                return
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+
+
+class StepProfiler:
+    """Wraps pipeline step methods to capture memory peaks, allocation sites and cProfile dumps"""
+
+    def __init__(self, profile_dir: pathlib.Path, top_n: int = 10):
+        self.profile_dir = profile_dir
+        self.top_n = top_n
+        self.results: List[dict] = []
+        self._calls: Dict[str, int] = {}
+
+    def wrap(self, name: str, method: Callable) -> Callable:
+        """Return `method` profiled under `name`"""
+        @functools.wraps(method)
+        def profiled(*args, **kwargs):
+            return self._run(name, method, args, kwargs)
+        return profiled
+
+    def _run(self, name: str, method: Callable, args, kwargs):
+        self._calls[name] = self._calls.get(name, 0) + 1
+        label = name if self._calls[name] == 1 else f"{name}_{self._calls[name]}"
+
+        sampler = _RssSampler() if PSUTIL_AVAILABLE else None
+        if sampler:
+            sampler.start()
+        rss_before = _max_rss()
+
+        exclusive = _PROFILE_LOCK.acquire(blocking=False)
+        if not exclusive:
+            logger.info(f"[PROFILE] {label}: another step is being profiled, recording timings only")
+        profiler = cProfile.Profile() if exclusive else None
+        if exclusive:
+            tracemalloc.start()
+            profiler.enable()
+        wall_started, cpu_started = time.perf_counter(), time.process_time()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            wall = time.perf_counter() - wall_started
+            cpu = time.process_time() - cpu_started
+            result = {'step': label, 'wall_s': round(wall, 2), 'cpu_s': round(cpu, 2),
+                      'py_peak_mb': None, 'top_allocations': []}
+            if exclusive:
+                profiler.disable()
+                _, peak = tracemalloc.get_traced_memory()
+                # Allocations still held when the step returns, minus the profiler's and the sampler's own
+                filters = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+                if sampler:
+                    filters.append(tracemalloc.Filter(False, str(pathlib.Path(psutil.__file__).parent / '*')))
+                snapshot = tracemalloc.take_snapshot().filter_traces(filters)
+                tracemalloc.stop()
+                _PROFILE_LOCK.release()
+                result['py_peak_mb'] = round(peak / MB, 2)
+                result['top_allocations'] = [
+                    f"{stat.traceback[0].filename}:{stat.traceback[0].lineno} "
+                    f"{stat.size / 1024:.1f} KiB in {stat.count} blocks"
+                    for stat in snapshot.statistics('lineno')[:self.top_n]
+                ]
+                self.profile_dir.mkdir(parents=True, exist_ok=True)
+                profiler.dump_stats(str(self.profile_dir / f"{label}.prof"))
+            # Per-step peaks: sampled RSS with psutil, otherwise only the growth of the
+            # process-wide high-water mark during the step (0 if an earlier step peaked higher)
+            result['rss_peak_mb'] = result['children_rss_peak_mb'] = None
+            if sampler:
+                sampler.stop()
+                result['rss_peak_mb'] = round(sampler.peak_self / MB, 1)
+                result['children_rss_peak_mb'] = round(sampler.peak_children / MB, 1)
+            rss_after = _max_rss()
+            for key, field in (('self', 'rss_growth_mb'), ('children', 'children_rss_growth_mb')):
+                growth = None
+                if rss_after[key] is not None:
+                    growth = round(rss_after[key] - rss_before[key], 1)
+                result[field] = growth
+            self.results.append(result)
+
+    def write_summary(self):
+        """Write the per-step table (text and JSON) and log it"""
+        if not self.results:
+            return
+        self.profile_dir.mkdir(parents=True, exist_ok=True)
+
+        def fmt(value) -> str:
+            return '-' if value is None else str(value)
+
+        def rss(r, prefix) -> str:
+            if r[f"{prefix}_peak_mb"] is not None:
+                return str(r[f"{prefix}_peak_mb"])
+            growth = r[f"{prefix}_growth_mb"]
+            return '-' if growth is None else f"+{growth}"
+
+        lines = [f"{'STEP':<22} {'WALL s':>8} {'CPU s':>8} {'PY PEAK MB':>11} {'RSS PEAK MB':>12} "
+                 f"{'CHILD RSS MB':>13}  TOP ALLOCATION"]
+        for r in self.results:
+            top = r['top_allocations'][0] if r['top_allocations'] else '-'
+            lines.append(f"{r['step']:<22} {r['wall_s']:>8} {r['cpu_s']:>8} {fmt(r['py_peak_mb']):>11} "
+                         f"{rss(r, 'rss'):>12} {rss(r, 'children_rss'):>13}  {top}")
+        lines.append("")
+        if PSUTIL_AVAILABLE:
+            lines.append(f"RSS values are sampled every {SAMPLE_INTERVAL}s during each step; "
+                         "CHILD RSS is the summed RSS of live child processes.")
+        else:
+            lines.append("Install psutil for per-step RSS peaks; +N is the growth of the process "
+                         "high-water mark during the step.")
+
+        (self.profile_dir / "summary.txt").write_text('\n'.join(lines) + '\n', encoding='utf-8')
+        (self.profile_dir / "summary.json").write_text(json.dumps(self.results, indent=2), encoding='utf-8')
+        for line in lines[:-2]:
+            logger.info(f"[PROFILE] {line}")
+        logger.info(f"Profiles saved to: {self.profile_dir}")
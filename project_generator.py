@@ -9,8 +9,24 @@ import argparse
 import sys
 import logging
 import re
+import os
+import signal
+import threading
+import time
+import hashlib
+import math
+import csv
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
 from datetime import datetime
-from typing import Optional, List
+from typing import Optional, List, Dict, Tuple, Iterable, Iterator
+
+from artifact_store import ArtifactStore, ArtifactStoreError
+from token_accounting import TokenAccountant, TokenBudgetExceeded
+from cassette import Cassette, CassetteError
+from profiling import StepProfiler
+from models import Plan
 
 # Optional tqdm for progress bar (graceful fallback)
 try:
@@ -46,20 +62,159 @@ class GeneratorError(Exception):
     pass
 
 
+class PlanLibrary:
+    """Local store of validated plans with a TF-IDF index over previous briefs"""
+
+    def __init__(self, library_dir: str):
+        self.library_dir = pathlib.Path(library_dir)
+        self.index_path = self.library_dir / "index.json"
+        self.entries = self._load_index()
+        self.lock = threading.Lock()
+
+    def _load_index(self) -> List[dict]:
+        """Load the brief index, starting empty if it is missing or unreadable"""
+        if not self.index_path.exists():
+            return []
+        try:
+            return json.loads(self.index_path.read_text(encoding='utf-8'))
+        except json.JSONDecodeError:
+            logger.warning(f"Plan library index is corrupt, rebuilding: {self.index_path}")
+            return []
+
+    @staticmethod
+    def tech_key(tech_stack: str) -> str:
+        """Normalize a tech stack: case, spacing and order don't matter"""
+        return ','.join(sorted({t.strip().lower() for t in tech_stack.split(',') if t.strip()}))
+
+    @classmethod
+    def brief_key(cls, description: str, tech_stack: str) -> str:
+        """Normalize a brief so that cosmetic differences map to the same key"""
+        text = ' '.join(description.lower().split())
+        return f"{text}|{cls.tech_key(tech_stack)}"
+
+    @staticmethod
+    def _terms(description: str, tech_stack: str) -> Counter:
+        """Bag of words over the description plus tech stack terms (weighted twice)"""
+        terms = Counter(w for w in re.findall(r'[\w#+.]+', description.lower()) if len(w) > 1)
+        for tech in tech_stack.split(','):
+            tech = tech.strip().lower()
+            if tech:
+                terms[f"tech:{tech}"] += 2
+        return terms
+
+    def _plan_path(self, key: str) -> pathlib.Path:
+        return self.library_dir / f"{hashlib.sha1(key.encode('utf-8')).hexdigest()}.json"
+
+    def _read_plan(self, key: str) -> Optional[dict]:
+        plan_path = self._plan_path(key)
+        if not plan_path.exists():
+            return None
+        try:
+            return json.loads(plan_path.read_text(encoding='utf-8'))
+        except json.JSONDecodeError:
+            return None
+
+    def get_exact(self, description: str, tech_stack: str) -> Optional[dict]:
+        """Return the stored plan for an identical (normalized) brief"""
+        return self._read_plan(self.brief_key(description, tech_stack))
+
+    def find_similar(self, description: str, tech_stack: str, limit: int = 3) -> List[Tuple[float, dict]]:
+        """Return up to `limit` (score, entry) pairs ranked by TF-IDF cosine similarity"""
+        with self.lock:
+            entries = list(self.entries)
+        if not entries:
+            return []
+
+        documents = [Counter(entry['terms']) for entry in entries]
+        query = self._terms(description, tech_stack)
+        total = len(documents) + 1
+        document_frequency = Counter()
+        for terms in documents + [query]:
+            document_frequency.update(terms.keys())
+        idf = {term: math.log((1 + total) / (1 + df)) + 1 for term, df in document_frequency.items()}
+
+        def vector(terms: Counter) -> Dict[str, float]:
+            return {term: count * idf[term] for term, count in terms.items()}
+
+        def norm(vec: Dict[str, float]) -> float:
+            return math.sqrt(sum(v * v for v in vec.values())) or 1.0
+
+        query_vec = vector(query)
+        query_norm = norm(query_vec)
+        scored = []
+        for entry, terms in zip(entries, documents):
+            doc_vec = vector(terms)
+            dot = sum(weight * doc_vec.get(term, 0.0) for term, weight in query_vec.items())
+            scored.append((dot / (query_norm * norm(doc_vec)), entry))
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return scored[:limit]
+
+    def load(self, entry: dict) -> Optional[dict]:
+        """Load the plan referenced by an index entry"""
+        return self._read_plan(entry['key'])
+
+    def store(self, project_name: str, description: str, tech_stack: str, plan: dict):
+        """Save a validated plan and (re)index its brief"""
+        self.library_dir.mkdir(parents=True, exist_ok=True)
+        key = self.brief_key(description, tech_stack)
+        with self.lock:
+            self._plan_path(key).write_text(json.dumps(plan, indent=2, ensure_ascii=False), encoding='utf-8')
+
+            self.entries = [entry for entry in self.entries if entry['key'] != key]
+            self.entries.append({
+                'key': key,
+                'project_name': project_name,
+                'description': description,
+                'tech_stack': tech_stack,
+                'terms': dict(self._terms(description, tech_stack)),
+                'created': datetime.now().isoformat(timespec='seconds'),
+            })
+            self.index_path.write_text(json.dumps(self.entries, indent=2, ensure_ascii=False), encoding='utf-8')
+
+
 class ProjectGenerator:
-    def __init__(self, config_path: str = "generator_config.json"):
+    def __init__(self, config_path: str = "generator_config.json", run_name: Optional[str] = None):
         """Initialize project generator with configuration"""
         self.config = self._load_config(config_path)
         self.output_dir = pathlib.Path(self.config['output_dir'])
         self.output_dir.mkdir(exist_ok=True)
         self.timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        if run_name:
+            # Keeps logs and artifacts apart when several generators start in the same second
+            self.timestamp = f"{self.timestamp}_{run_name}"
         self.steps_completed = 0
         self.total_steps = 4  # planning, structure, implementation, validation
+        self.artifact_store = self._open_artifact_store()
+        tokens = self.config.get('tokens', {})
+        self.tokens = TokenAccountant(
+            pathlib.Path(self.config['logs_dir']) / tokens.get('ledger_file', 'token_ledger.json'),
+            f"{self.timestamp}_generator", tokens
+        )
+        plan_cache = self.config.get('plan_cache', {})
+        self.plan_library = PlanLibrary(plan_cache.get('dir', 'plan_cache')) if plan_cache.get('enabled', True) else None
+        # Set by BatchGenerator to share limits and planning results between generators
+        self.planning_slots: Optional[threading.Semaphore] = None
+        self.implementation_slots: Optional[threading.Semaphore] = None
+        self.plan_lock: Optional[threading.Lock] = None
+        self.cassette: Optional[Cassette] = None
+        self.profiler: Optional[StepProfiler] = None
+        self.plan_source = "gemini"
+        # step_implementation logs Codex failures and carries on; kept so batch runs can report them
+        self.implementation_error: Optional[str] = None
+        self.step_timings: Dict[str, float] = {}
     
-    def _progress_bar(self, items: List, desc: str = "Processing"):
+    def enable_profiling(self):
+        """Profile every pipeline step; steps are left unwrapped unless this is called"""
+        profiling = self.config.get('profiling', {})
+        self.profiler = StepProfiler(pathlib.Path(self.config['logs_dir']) / f"{self.timestamp}_profile",
+                                     profiling.get('top_allocations', 10))
+        for name in ('step_planning', 'step_structure', 'step_implementation', 'step_validation'):
+            setattr(self, name, self.profiler.wrap(name[len('step_'):], getattr(self, name)))
+
+    def _progress_bar(self, items: Iterable, desc: str = "Processing", total: Optional[int] = None):
         """Create a progress bar if tqdm is available, otherwise return items as-is"""
         if TQDM_AVAILABLE and tqdm:
-            return tqdm(items, desc=desc, ncols=80, leave=True)
+            return tqdm(items, desc=desc, total=total, ncols=80, leave=True)
         return items
     
     def _update_progress(self, step_name: str):
@@ -83,6 +238,35 @@ class ProjectGenerator:
                         "structure": True,
                         "implementation": True,
                         "validation": True
+                    },
+                    "implementation": {
+                        "poll_interval": 2,
+                        "stall_timeout": 600
+                    },
+                    "plan_cache": {
+                        "enabled": True,
+                        "dir": "plan_cache",
+                        "similarity_threshold": 0.6,
+                        "reuse_similar": False
+                    },
+                    "tokens": {
+                        "ledger_file": "token_ledger.json",
+                        "chars_per_token": 4,
+                        "max_run_tokens": None,
+                        "steps": {}
+                    },
+                    "batch": {
+                        "max_workers": 4,
+                        "planning_concurrency": 2,
+                        "implementation_concurrency": 2
+                    },
+                    "artifacts": {
+                        "enabled": False,
+                        "dir": "artifacts",
+                        "codec": "lzma"
+                    },
+                    "profiling": {
+                        "top_allocations": 10
                     }
                 }
                 config_file.write_text(json.dumps(default_config, indent=2), encoding='utf-8')
@@ -92,10 +276,10 @@ class ProjectGenerator:
         except json.JSONDecodeError as e:
             raise GeneratorError(f"Invalid JSON in config: {e}")
     
-    def _run_command(self, cmd: str, description: str) -> str:
-        """Run shell command with error handling"""
+    @staticmethod
+    def _execute(cmd: str) -> Tuple[str, int]:
+        """Run shell command and return (output, exit code)"""
         try:
-            logger.info(f"Running: {description}")
             result = subprocess.check_output(
                 cmd, 
                 shell=True, 
@@ -104,26 +288,191 @@ class ProjectGenerator:
                 errors='replace',
                 stderr=subprocess.STDOUT
             )
-            return result
+            return result, 0
         except subprocess.CalledProcessError as e:
+            return e.output, e.returncode
+
+    def _normalize(self, text: str) -> str:
+        """Strip the run timestamp so recorded calls match across runs"""
+        return text.replace(self.timestamp, '<timestamp>')
+
+    def _run_command(self, cmd: str, description: str) -> str:
+        """Run shell command with error handling"""
+        logger.info(f"Running: {description}")
+        try:
+            if self.cassette:
+                output, exit_code = self.cassette.run(cmd, description, lambda: self._execute(cmd), self._normalize)
+            else:
+                output, exit_code = self._execute(cmd)
+        except CassetteError as e:
+            raise GeneratorError(f"Cassette error: {e}")
+        if exit_code != 0:
             logger.error(f"Command failed: {description}")
-            logger.error(f"Error: {e.output}")
-            raise GeneratorError(f"Failed to execute: {description}") from e
+            logger.error(f"Error: {output}")
+            raise GeneratorError(f"Failed to execute: {description}")
+        return output
     
+    def _start_command(self, cmd: str, description: str) -> subprocess.Popen:
+        """Start shell command with its output piped for streaming"""
+        logger.info(f"Running: {description}")
+        if self.cassette and self.cassette.mode == 'replay':
+            # Stand-in process that prints the recorded output, after the recorded delay if asked to
+            try:
+                call = self.cassette.replay(cmd, description, self._normalize, wait=False)
+            except CassetteError as e:
+                raise GeneratorError(f"Cassette error: {e}")
+            delay = call['latency'] if self.cassette.timing == 'original' else 0
+            replay_file = pathlib.Path(self.config['logs_dir']) / f"{self.timestamp}_replay_output.txt"
+            replay_file.write_text(call['output'], encoding='utf-8')
+            script = ("import os, sys, time; time.sleep(float(sys.argv[1])); "
+                      "data = open(sys.argv[2], 'rb').read(); os.remove(sys.argv[2]); "
+                      "sys.stdout.buffer.write(data); sys.exit(int(sys.argv[3]))")
+            cmd = [sys.executable, '-c', script, str(delay), str(replay_file), str(call['exit_code'])]
+        return subprocess.Popen(
+            cmd,
+            shell=isinstance(cmd, str),
+            text=True,
+            encoding='utf-8',
+            errors='replace',
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            # Own process group so a stalled run can be killed with its children
+            start_new_session=(sys.platform != 'win32')
+        )
+
+    @staticmethod
+    def _pump_output(process: subprocess.Popen, lines: List[str], activity: dict):
+        """Log streamed command output line by line and record the time of last activity"""
+        for line in process.stdout:
+            lines.append(line)
+            activity['last'] = time.monotonic()
+            if line.strip():
+                logger.info(f"  codex> {line.rstrip()}")
+        process.wait()
+
+    @staticmethod
+    def _kill_process_tree(process: subprocess.Popen):
+        """Kill a started shell command together with the tools it spawned"""
+        try:
+            if sys.platform == 'win32':
+                subprocess.run(['taskkill', '/F', '/T', '/PID', str(process.pid)],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            else:
+                os.killpg(process.pid, signal.SIGKILL)
+        except (OSError, subprocess.SubprocessError) as e:
+            logger.warning(f"Could not kill process {process.pid}: {e}")
+
+    @staticmethod
+    def _file_states(project_root: pathlib.Path, paths: List[str]) -> Dict[str, Tuple[float, int]]:
+        """(mtime, size) of each path, (0, 0) for missing files"""
+        states = {}
+        for path in paths:
+            try:
+                stat = (project_root / path).stat()
+                states[path] = (stat.st_mtime, stat.st_size)
+            except OSError:
+                states[path] = (0.0, 0)
+        return states
+
+    def _watch_generated_files(self, process: subprocess.Popen, project_root: pathlib.Path,
+                               initial: Dict[str, Tuple[float, int]], activity: dict) -> Iterator[str]:
+        """Yield planned files as they get written, killing the run if it stalls before exiting
+
+        `initial` must be taken before the process starts so early writes are not missed.
+        """
+        implementation = self.config.get('implementation', {})
+        poll_interval = implementation.get('poll_interval', 2)
+        stall_timeout = implementation.get('stall_timeout', 600)
+
+        # step_structure leaves empty placeholders; a file counts once it changes and has content
+        pending = list(initial)
+        while True:
+            finished = process.poll() is not None
+            if pending:
+                states = self._file_states(project_root, pending)
+                for path in list(pending):
+                    if states[path] != initial[path] and states[path][1] > 0:
+                        pending.remove(path)
+                        activity['last'] = time.monotonic()
+                        yield path
+            if finished:
+                return
+
+            idle = time.monotonic() - activity['last']
+            if stall_timeout and idle > stall_timeout:
+                self._kill_process_tree(process)
+                raise GeneratorError(f"Code generation stalled: no output or file changes for {idle:.0f}s")
+            time.sleep(poll_interval)
+
+    def _open_artifact_store(self) -> Optional[ArtifactStore]:
+        """Open the content-addressed artifact store if enabled in config"""
+        artifacts = self.config.get('artifacts', {})
+        if not artifacts.get('enabled', False):
+            return None
+        try:
+            return ArtifactStore(artifacts.get('dir', 'artifacts'), f"{self.timestamp}_generator",
+                                 artifacts.get('codec', 'lzma'))
+        except ArtifactStoreError as e:
+            raise GeneratorError(f"Invalid artifact store config: {e}")
+
+    def _archive_prompt(self, prompt_file: pathlib.Path):
+        """Move a sent prompt file into the artifact store, if enabled"""
+        if self.artifact_store:
+            self._save_output(prompt_file.name[len(self.timestamp) + 1:], prompt_file.read_text(encoding='utf-8'))
+            prompt_file.unlink()
+
+    def _prepare_prompt(self, step: str, sections: Dict[str, str], render) -> str:
+        """Render a prompt through token accounting, enforcing the step's budget"""
+        try:
+            return self.tokens.prepare(step, sections, render)
+        except TokenBudgetExceeded as e:
+            raise GeneratorError(f"Token budget exceeded: {e}")
+
     def _save_output(self, filename: str, content: str):
         """Save output to file with timestamp"""
+        if self.artifact_store:
+            digest = self.artifact_store.put(filename, content)
+            logger.info(f"Stored artifact: {filename} ({digest[:12]})")
+            return
         logs_dir = pathlib.Path(self.config['logs_dir'])
         logs_dir.mkdir(exist_ok=True)
         output_path = logs_dir / f"{self.timestamp}_{filename}"
         output_path.write_text(content, encoding='utf-8')
         logger.info(f"Saved output to: {output_path}")
     
-    def step_planning(self, project_name: str, description: str, tech_stack: str) -> dict:
+    def step_planning(self, project_name: str, description: str, tech_stack: str) -> Plan:
         """Step 1: Generate project plan with Gemini"""
         if not self.config['steps'].get('planning', True):
             logger.info("Skipping planning step")
-            return {}
+            return Plan.from_dict({})
         
+        plan_cache = self.config.get('plan_cache', {})
+        template_section = ""
+        if self.plan_library and not plan_cache.get('fresh', False):
+            cached = self.plan_library.get_exact(description, tech_stack)
+            if cached:
+                logger.info("[PLAN CACHE] Reusing stored plan for identical brief")
+                self.plan_source = "cache"
+                return self._adapt_plan(cached, project_name, description, tech_stack)
+
+            threshold = plan_cache.get('similarity_threshold', 0.6)
+            matches = [(score, entry) for score, entry in self.plan_library.find_similar(description, tech_stack)
+                       if score >= threshold]
+            for score, entry in matches:
+                logger.info(f"[PLAN CACHE] Similar plan: {entry['project_name']} ({score:.2f}) - {entry['description']}")
+            template = self.plan_library.load(matches[0][1]) if matches else None
+            if template:
+                if plan_cache.get('reuse_similar', False):
+                    logger.info(f"[PLAN CACHE] Reusing similar plan from {matches[0][1]['project_name']}")
+                    self.plan_source = "similar"
+                    return self._adapt_plan(template, project_name, description, tech_stack)
+                self.plan_source = "template"
+                template_section = f"""
+
+REFERENCE PLAN (from a similar previous project, adapt it to this brief instead of starting over):
+{json.dumps(template, indent=2, ensure_ascii=False)}
+"""
+
         logger.info("[GEMINI] Creating project plan")
         
         # Ensure logs directory exists
@@ -132,13 +481,16 @@ class ProjectGenerator:
         
         # Create planning prompt
         prompt_file = logs_dir / f"{self.timestamp}_planning_prompt.txt"
-        prompt_content = f"""You are a senior software architect and full-stack developer.
+        prompt_content = self._prepare_prompt(
+            'planning',
+            {'reference_plan': template_section},
+            lambda sections: f"""You are a senior software architect and full-stack developer.
 
 PROJECT BRIEF:
 Name: {project_name}
 Description: {description}
 Technology Stack: {tech_stack}
-
+{sections['reference_plan']}
 YOUR TASK:
 Create a comprehensive project plan with the following structure (RETURN ONLY VALID JSON):
 
@@ -183,6 +535,7 @@ IMPORTANT:
 - Include all necessary files for a working project
 - Be specific about folder structure
 - Include setup instructions"""
+        )
         
         prompt_file.write_text(prompt_content, encoding='utf-8')
         
@@ -190,14 +543,26 @@ IMPORTANT:
         prompt_file_abs = str(prompt_file.absolute())
         cmd = f'powershell -Command "Get-Content \'{prompt_file_abs}\' | gemini -p -"'
         
-        plan_output = self._run_command(cmd, "Project planning")
+        try:
+            plan_output = self._run_command(cmd, "Project planning")
+        except GeneratorError:
+            self.tokens.record_failure('planning')
+            raise
+        self.tokens.record_output('planning', plan_output)
+        self._archive_prompt(prompt_file)
         self._save_output("project_plan.json", plan_output)
         
-        # Extract JSON from response
+        plan_data = self._parse_plan(plan_output)
+        plan = Plan.from_dict(plan_data)
+        logger.info(f"Project plan created: {len(plan.files)} files to generate")
+        if self.plan_library and self._is_valid_plan(plan_data):
+            self.plan_library.store(project_name, description, tech_stack, plan_data)
+        return plan
+
+    def _parse_plan(self, plan_output: str) -> dict:
+        """Extract the plan JSON from Gemini output"""
         try:
-            plan = json.loads(plan_output)
-            logger.info(f"Project plan created: {len(plan.get('files_to_generate', []))} files to generate")
-            return plan
+            return json.loads(plan_output)
         except json.JSONDecodeError:
             logger.warning("Plan output is not valid JSON, attempting to extract...")
             json_match = re.search(r'```(?:json)?\s*([\s\S]*?)```', plan_output)
@@ -212,8 +577,26 @@ IMPORTANT:
                 return json.loads(json_match.group(0))
             
             raise GeneratorError("Could not extract valid JSON from planning output")
+
+    @staticmethod
+    def _is_valid_plan(plan: dict) -> bool:
+        """Check that a plan has the fields the later steps rely on"""
+        files = plan.get('files_to_generate')
+        return (
+            isinstance(plan.get('folder_structure'), dict)
+            and isinstance(files, list) and len(files) > 0
+            and all(isinstance(f, dict) and 'path' in f for f in files)
+        )
+
+    @staticmethod
+    def _adapt_plan(plan: dict, project_name: str, description: str, tech_stack: str) -> Plan:
+        """Build a plan from a stored one and point it at the current brief"""
+        adapted = Plan.from_dict(plan)
+        adapted.project_name, adapted.description, adapted.tech_stack = project_name, description, tech_stack
+        logger.info(f"Project plan loaded: {len(adapted.files)} files to generate")
+        return adapted
     
-    def step_structure(self, project_name: str, plan: dict) -> Optional[pathlib.Path]:
+    def step_structure(self, project_name: str, plan: Plan) -> Optional[pathlib.Path]:
         """Step 2: Create project folder structure"""
         if not self.config['steps'].get('structure', True):
             logger.info("Skipping structure step")
@@ -233,17 +616,13 @@ IMPORTANT:
         project_root.mkdir(parents=True, exist_ok=True)
         logger.info(f"Created project root: {project_root}")
         
-        # Create folder structure from plan
-        folder_structure = plan.get('folder_structure', {})
-        
         # Create root files (empty for now)
-        for root_file in folder_structure.get('root_files', []):
+        for root_file in plan.root_files:
             (project_root / root_file).touch()
             logger.info(f"  Created: {root_file}")
         
         # Create directories and their files
-        directories = folder_structure.get('directories', {})
-        for dir_name, files in directories.items():
+        for dir_name, files in plan.directories.items():
             dir_path = project_root / dir_name
             dir_path.mkdir(parents=True, exist_ok=True)
             logger.info(f"  Created directory: {dir_name}/")
@@ -258,7 +637,7 @@ IMPORTANT:
         logger.info(f"Project structure created successfully: {project_root}")
         return project_root
     
-    def step_implementation(self, project_root: pathlib.Path, plan: dict):
+    def step_implementation(self, project_root: pathlib.Path, plan: Plan):
         """Step 3: Generate code files with Codex"""
         if not self.config['steps'].get('implementation', True):
             logger.info("Skipping implementation step")
@@ -266,7 +645,7 @@ IMPORTANT:
         
         logger.info("[CODEX] Generating project files")
         
-        files_to_generate = plan.get('files_to_generate', [])
+        files_to_generate = plan.files
         if not files_to_generate:
             logger.warning("No files to generate in plan")
             return
@@ -281,24 +660,29 @@ IMPORTANT:
         prompt_file = logs_dir / f"{self.timestamp}_implementation_prompt.txt"
         
         files_list = "\n".join([
-            f"- {f['path']}: {f['description']}" 
+            f"- {f.path}: {f.description}" 
             for f in files_to_generate
         ])
         
-        prompt_content = f"""You are an expert full-stack developer.
+        dependencies = f"""Runtime: {', '.join(plan.runtime_dependencies)}
+Dev: {', '.join(plan.dev_dependencies)}"""
+        
+        prompt_content = self._prepare_prompt(
+            'implementation',
+            {'files': files_list, 'dependencies': dependencies},
+            lambda sections: f"""You are an expert full-stack developer.
 
-PROJECT: {plan.get('project_name', 'Unknown')}
-DESCRIPTION: {plan.get('description', 'No description')}
-TECH STACK: {plan.get('tech_stack', 'Not specified')}
+PROJECT: {plan.project_name or 'Unknown'}
+DESCRIPTION: {plan.description or 'No description'}
+TECH STACK: {plan.tech_stack or 'Not specified'}
 
 PROJECT ROOT: {project_root}
 
 FILES TO CREATE:
-{files_list}
+{sections['files']}
 
 DEPENDENCIES:
-Runtime: {', '.join(plan.get('dependencies', {}).get('runtime', []))}
-Dev: {', '.join(plan.get('dependencies', {}).get('dev', []))}
+{sections['dependencies']}
 
 INSTRUCTIONS:
 1. Generate complete, production-ready code for each file
@@ -309,6 +693,7 @@ INSTRUCTIONS:
 
 Start by creating all necessary files with complete implementations.
 Work in the directory: {project_root}"""
+        )
         
         prompt_file.write_text(prompt_content, encoding='utf-8')
         
@@ -316,13 +701,41 @@ Work in the directory: {project_root}"""
         prompt_file_abs = str(prompt_file.absolute())
         cmd = f'cd "{project_root}" && powershell -Command "Get-Content \'{prompt_file_abs}\' | codex exec --dangerously-bypass-approvals-and-sandbox"'
         
+        planned_paths = list(dict.fromkeys(f.path for f in files_to_generate))
+        initial = self._file_states(project_root, planned_paths)
+        process = self._start_command(cmd, "Code generation")
+        output_lines: List[str] = []
+        activity = {'last': time.monotonic()}
+        reader = threading.Thread(target=self._pump_output, args=(process, output_lines, activity), daemon=True)
+        reader.start()
+        
+        started = time.monotonic()
+        written = 0
         try:
-            result = self._run_command(cmd, "Code generation")
-            self._save_output("codex_implementation.txt", result)
-            logger.info("Code generation completed successfully")
+            watcher = self._watch_generated_files(process, project_root, initial, activity)
+            for path in self._progress_bar(watcher, desc="Generating files", total=len(planned_paths)):
+                written += 1
+                elapsed = time.monotonic() - started
+                eta = elapsed / written * (len(planned_paths) - written)
+                logger.info(f"  [{written}/{len(planned_paths)}] {path} written "
+                            f"({elapsed:.0f}s elapsed, ETA {eta:.0f}s)")
+            # The process has exited; don't hang on a pipe kept open by an orphaned child
+            reader.join(timeout=5)
+            if process.returncode != 0:
+                raise GeneratorError(f"Failed to execute: Code generation (exit code {process.returncode})")
+            logger.info(f"Code generation completed successfully ({written}/{len(planned_paths)} planned files written)")
         except GeneratorError as e:
+            self.implementation_error = str(e)
             logger.error(f"Code generation failed: {e}")
             logger.warning("Some files may not have been generated")
+        finally:
+            reader.join(timeout=5)
+            if self.cassette and self.cassette.mode == 'record':
+                self.cassette.record(cmd, "Code generation", ''.join(output_lines), process.returncode or 0,
+                                     time.monotonic() - started, self._normalize)
+            self._save_output("codex_implementation.txt", ''.join(output_lines))
+            self.tokens.record_output('implementation', ''.join(output_lines))
+            self._archive_prompt(prompt_file)
     
     def step_validation(self, project_root: pathlib.Path):
         """Step 4: Validate generated project"""
@@ -352,40 +765,63 @@ Work in the directory: {project_root}"""
         
         logger.info("Validation completed")
     
-    def generate(self, project_name: str, description: str, tech_stack: str):
-        """Run the complete project generation pipeline"""
-        try:
-            logger.info("=" * 60)
-            logger.info("AI PROJECT GENERATOR")
-            logger.info("=" * 60)
-            logger.info(f"Project: {project_name}")
-            logger.info(f"Description: {description}")
-            logger.info(f"Tech Stack: {tech_stack}")
-            logger.info("=" * 60)
-            
-            # Step 1: Planning
+    @contextmanager
+    def _timed(self, step_name: str, slots: Optional[threading.Semaphore] = None,
+               lock: Optional[threading.Lock] = None):
+        """Hold shared batch limits around a step and record its duration"""
+        with ExitStack() as stack:
+            # Take the plan lock before a slot so waiting on it never blocks other entries
+            for guard in (lock, slots):
+                if guard is not None:
+                    stack.enter_context(guard)
+            started = time.monotonic()
+            try:
+                yield
+            finally:
+                self.step_timings[step_name] = round(time.monotonic() - started, 1)
+
+    def run_pipeline(self, project_name: str, description: str, tech_stack: str) -> Optional[pathlib.Path]:
+        """Run all generation steps, raising on failure instead of exiting"""
+        logger.info("=" * 60)
+        logger.info("AI PROJECT GENERATOR")
+        logger.info("=" * 60)
+        logger.info(f"Project: {project_name}")
+        logger.info(f"Description: {description}")
+        logger.info(f"Tech Stack: {tech_stack}")
+        logger.info("=" * 60)
+        
+        # Step 1: Planning
+        with self._timed("planning", self.planning_slots, self.plan_lock):
             plan = self.step_planning(project_name, description, tech_stack)
-            self._update_progress("Planning")
-            
-            # Step 2: Create structure
-            project_root = self.step_structure(project_name, plan)
-            self._update_progress("Structure")
-            
-            # Step 3: Generate code
-            if project_root:
+        self._update_progress("Planning")
+        
+        # Step 2: Create structure
+        project_root = self.step_structure(project_name, plan)
+        self._update_progress("Structure")
+        
+        # Step 3: Generate code
+        if project_root:
+            with self._timed("implementation", self.implementation_slots):
                 self.step_implementation(project_root, plan)
-                self._update_progress("Implementation")
-                
-                # Step 4: Validate
-                self.step_validation(project_root)
-                self._update_progress("Validation")
+            self._update_progress("Implementation")
             
-            logger.info("=" * 60)
-            logger.info("SUCCESS: Project generation completed")
-            logger.info(f"Project location: {project_root}")
-            logger.info("=" * 60)
-            
-            return project_root
+            # Step 4: Validate
+            self.step_validation(project_root)
+            self._update_progress("Validation")
+        
+        logger.info("=" * 60)
+        logger.info("SUCCESS: Project generation completed")
+        logger.info(f"Project location: {project_root}")
+        for line in self.tokens.summary():
+            logger.info(f"  Tokens {line}")
+        logger.info("=" * 60)
+        
+        return project_root
+
+    def generate(self, project_name: str, description: str, tech_stack: str):
+        """Run the complete project generation pipeline"""
+        try:
+            return self.run_pipeline(project_name, description, tech_stack)
             
         except GeneratorError as e:
             logger.error(f"Generation failed: {e}")
@@ -396,6 +832,150 @@ Work in the directory: {project_root}"""
         except Exception as e:
             logger.error(f"Unexpected error: {e}", exc_info=True)
             sys.exit(1)
+        finally:
+            if self.profiler:
+                self.profiler.write_summary()
+
+
+class BatchGenerator:
+    """Runs the generator for many manifest entries with bounded parallelism"""
+
+    SUMMARY_FIELDS = ['index', 'name', 'tech', 'status', 'plan', 'planning_s', 'implementation_s',
+                      'total_s', 'project_root', 'error']
+
+    def __init__(self, config_path: str, max_workers: int, planning_jobs: int, implementation_jobs: int,
+                 configure=None):
+        self.config_path = config_path
+        self.max_workers = max(1, max_workers)
+        self.planning_slots = threading.Semaphore(max(1, planning_jobs))
+        self.implementation_slots = threading.Semaphore(max(1, implementation_jobs))
+        self.configure = configure
+        self.timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.lock = threading.Lock()
+        self.plan_locks: Dict[str, threading.Lock] = {}
+        self.plan_library: Optional[PlanLibrary] = None
+
+    @staticmethod
+    def load_manifest(manifest_path: str) -> List[dict]:
+        """Read briefs from a CSV file (with header) or JSON Lines"""
+        path = pathlib.Path(manifest_path)
+        if not path.exists():
+            raise GeneratorError(f"Manifest not found: {manifest_path}")
+        if path.suffix.lower() == '.csv':
+            with path.open(encoding='utf-8-sig', newline='') as f:
+                return [dict(row) for row in csv.DictReader(f)]
+
+        entries = []
+        for line_no, line in enumerate(path.read_text(encoding='utf-8').splitlines(), 1):
+            if not line.strip() or line.lstrip().startswith('#'):
+                continue
+            try:
+                entries.append(json.loads(line))
+            except json.JSONDecodeError as e:
+                raise GeneratorError(f"Invalid JSON on manifest line {line_no}: {e}")
+        return entries
+
+    def _plan_lock(self, description: str, tech_stack: str, reuse_similar: bool) -> threading.Lock:
+        """Lock shared by entries that can reuse each other's plan, so only the first one asks Gemini
+
+        That is entries with the same brief (exact cache hit), or the same tech stack when
+        similar plans are reused; everything else plans in parallel up to planning_concurrency.
+        """
+        key = PlanLibrary.tech_key(tech_stack) if reuse_similar else PlanLibrary.brief_key(description, tech_stack)
+        with self.lock:
+            return self.plan_locks.setdefault(key, threading.Lock())
+
+    def _run_entry(self, index: int, entry: dict) -> dict:
+        name = (entry.get('name') or '').strip()
+        description = (entry.get('description') or '').strip()
+        tech_stack = (entry.get('tech') or entry.get('tech_stack') or '').strip()
+        row = {'index': index, 'name': name, 'tech': tech_stack, 'status': 'failed', 'plan': '',
+               'planning_s': '', 'implementation_s': '', 'total_s': '', 'project_root': '', 'error': ''}
+        if entry.get('_error'):
+            row['error'] = entry['_error']
+            return row
+        if not (name and description and tech_stack):
+            row['error'] = "Entry needs name, description and tech"
+            return row
+
+        threading.current_thread().name = name
+        started = time.monotonic()
+        generator = None
+        try:
+            slug = re.sub(r'[^\w-]+', '_', name)[:40]
+            generator = ProjectGenerator(self.config_path, run_name=f"{index:03d}_{slug}")
+            if self.configure:
+                self.configure(generator)
+            with self.lock:
+                # All entries share one plan library so finished plans are visible to the rest
+                if self.plan_library is None:
+                    self.plan_library = generator.plan_library
+                generator.plan_library = self.plan_library
+            generator.planning_slots = self.planning_slots
+            generator.implementation_slots = self.implementation_slots
+            generator.plan_lock = self._plan_lock(
+                description, tech_stack, generator.config.get('plan_cache', {}).get('reuse_similar', False))
+
+            project_root = generator.run_pipeline(name, description, tech_stack)
+            row['project_root'] = str(project_root or '')
+            if generator.implementation_error:
+                row['error'] = f"Code generation: {generator.implementation_error}"
+            else:
+                row['status'] = 'ok'
+
+        except GeneratorError as e:
+            logger.error(f"Generation failed for {name}: {e}")
+            row['error'] = str(e)
+        except Exception as e:
+            logger.error(f"Unexpected error for {name}: {e}", exc_info=True)
+            row['error'] = f"{type(e).__name__}: {e}"
+
+        if generator:
+            row.update(plan=generator.plan_source,
+                       planning_s=generator.step_timings.get('planning', ''),
+                       implementation_s=generator.step_timings.get('implementation', ''))
+            if generator.profiler:
+                generator.profiler.write_summary()
+        row['total_s'] = round(time.monotonic() - started, 1)
+        return row
+
+    def _write_summary(self, rows: List[dict], logs_dir: pathlib.Path) -> pathlib.Path:
+        logs_dir.mkdir(exist_ok=True)
+        summary_path = logs_dir / f"{self.timestamp}_batch_summary.csv"
+        with summary_path.open('w', encoding='utf-8', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=self.SUMMARY_FIELDS)
+            writer.writeheader()
+            writer.writerows(rows)
+
+        logger.info("=" * 60)
+        logger.info(f"{'#':>3}  {'PROJECT':<24} {'STATUS':<7} {'PLAN':<8} {'PLAN s':>7} {'IMPL s':>7} {'TOTAL s':>8}")
+        for row in rows:
+            logger.info(f"{row['index']:>3}  {row['name'][:24]:<24} {row['status']:<7} {row['plan']:<8} "
+                        f"{str(row['planning_s']):>7} {str(row['implementation_s']):>7} {str(row['total_s']):>8}"
+                        + (f"  {row['error']}" if row['error'] else ''))
+        logger.info("=" * 60)
+        logger.info(f"Batch summary saved to: {summary_path}")
+        return summary_path
+
+    def run(self, entries: List[dict], logs_dir: pathlib.Path) -> List[dict]:
+        """Generate all entries; failures are recorded in the summary, never raised"""
+        seen = set()
+        for entry in entries:
+            name = (entry.get('name') or '').strip().lower()
+            if name and name in seen:
+                entry['_error'] = "Duplicate project name in manifest"
+            seen.add(name)
+
+        # Thread names in log lines tell interleaved projects apart
+        for handler in logging.getLogger().handlers:
+            handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - [%(threadName)s] %(message)s'))
+
+        logger.info(f"Batch: {len(entries)} project(s), {self.max_workers} worker(s)")
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='batch') as executor:
+            rows = list(executor.map(self._run_entry, range(1, len(entries) + 1), entries))
+
+        self._write_summary(rows, logs_dir)
+        return rows
 
 
 def main():
@@ -406,23 +986,40 @@ def main():
 Örnek kullanım:
   python project_generator.py --name "MyPortfolio" --description "Kişisel portfolyo sitesi" --tech "HTML, CSS, JavaScript"
   python project_generator.py --name "BlogAPI" --description "RESTful blog API" --tech "Node.js, Express, MongoDB"
+  python project_generator.py --manifest briefs.jsonl --jobs 8 --planning-jobs 4 --implementation-jobs 2
         """
     )
     parser.add_argument(
         '--name', 
-        required=True,
         help='Proje ismi (örn: MyWebsite)'
     )
     parser.add_argument(
         '--description',
-        required=True,
         help='Proje açıklaması (örn: E-ticaret sitesi)'
     )
     parser.add_argument(
         '--tech',
-        required=True,
         help='Teknoloji stack (örn: React, Node.js, PostgreSQL)'
     )
+    parser.add_argument(
+        '--manifest',
+        help='Toplu üretim için brief listesi (JSONL veya CSV: name, description, tech)'
+    )
+    parser.add_argument(
+        '--jobs',
+        type=int,
+        help='Toplu üretimde aynı anda işlenecek proje sayısı'
+    )
+    parser.add_argument(
+        '--planning-jobs',
+        type=int,
+        help='Toplu üretimde eşzamanlı planlama (Gemini) sınırı'
+    )
+    parser.add_argument(
+        '--implementation-jobs',
+        type=int,
+        help='Toplu üretimde eşzamanlı kod üretimi (Codex) sınırı'
+    )
     parser.add_argument(
         '--config', 
         default='generator_config.json',
@@ -433,6 +1030,37 @@ def main():
         action='store_true',
         help='Planning adımını atla'
     )
+    parser.add_argument(
+        '--fresh-plan',
+        action='store_true',
+        help='Plan önbelleğini yok say, her zaman yeni plan oluştur'
+    )
+    parser.add_argument(
+        '--reuse-similar-plan',
+        action='store_true',
+        help='Benzer bir önceki planı Gemini çağrısı yapmadan doğrudan kullan'
+    )
+    parser.add_argument(
+        '--record-cassette',
+        metavar='PATH',
+        help='Tüm harici araç çağrılarını (çıktı, çıkış kodu, süre) kasete kaydet'
+    )
+    parser.add_argument(
+        '--replay-cassette',
+        metavar='PATH',
+        help='Araçları çalıştırmadan kasetteki kayıtları oynat'
+    )
+    parser.add_argument(
+        '--replay-timing',
+        choices=['instant', 'original'],
+        default='instant',
+        help='Kayıtları anında veya orijinal süreleriyle oynat (default: instant)'
+    )
+    parser.add_argument(
+        '--profile',
+        action='store_true',
+        help='Her adım için bellek zirvesi, en büyük ayırma noktaları ve cProfile çıktısını logs_dir altına yaz'
+    )
     parser.add_argument(
         '--skip-validation',
         action='store_true',
@@ -440,15 +1068,56 @@ def main():
     )
     
     args = parser.parse_args()
+    if not args.manifest and not (args.name and args.description and args.tech):
+        parser.error('--name, --description ve --tech gerekli (veya --manifest kullanın)')
     
     # Load generator
     generator = ProjectGenerator(args.config)
     
     # Override config with CLI args
-    if args.skip_planning:
-        generator.config['steps']['planning'] = False
-    if args.skip_validation:
-        generator.config['steps']['validation'] = False
+    def apply_overrides(target: ProjectGenerator):
+        if args.skip_planning:
+            target.config['steps']['planning'] = False
+        if args.skip_validation:
+            target.config['steps']['validation'] = False
+        if args.fresh_plan:
+            target.config.setdefault('plan_cache', {})['fresh'] = True
+        if args.reuse_similar_plan:
+            target.config.setdefault('plan_cache', {})['reuse_similar'] = True
+        target.cassette = cassette
+        if args.profile:
+            target.enable_profiling()
+    
+    if args.record_cassette and args.replay_cassette:
+        parser.error('--record-cassette ve --replay-cassette birlikte kullanılamaz')
+    try:
+        cassette = None
+        if args.record_cassette:
+            cassette = Cassette.open(args.record_cassette, 'record')
+        elif args.replay_cassette:
+            cassette = Cassette.open(args.replay_cassette, 'replay', args.replay_timing)
+    except CassetteError as e:
+        logger.error(str(e))
+        sys.exit(1)
+    
+    apply_overrides(generator)
+    
+    if args.manifest:
+        batch_config = generator.config.get('batch', {})
+        try:
+            entries = BatchGenerator.load_manifest(args.manifest)
+        except GeneratorError as e:
+            logger.error(f"Batch failed: {e}")
+            sys.exit(1)
+        batch = BatchGenerator(
+            args.config,
+            args.jobs or batch_config.get('max_workers', 4),
+            args.planning_jobs or batch_config.get('planning_concurrency', 2),
+            args.implementation_jobs or batch_config.get('implementation_concurrency', 2),
+            configure=apply_overrides
+        )
+        rows = batch.run(entries, pathlib.Path(generator.config['logs_dir']))
+        sys.exit(0 if all(row['status'] == 'ok' for row in rows) else 1)
     
     # Generate project
     generator.generate(args.name, args.description, args.tech)
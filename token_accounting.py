@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Token Accounting - Prompt size, token estimates and budgets per LLM call
+"""
+import json
+import logging
+import math
+import os
+import pathlib
+import threading
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Ledger writes are serialized process-wide; several pipelines may share one ledger
+_LEDGER_LOCK = threading.Lock()
+
+TRUNCATION_MARKER = "\n[... {removed} characters removed to fit the token budget ...]\n"
+
+
+class TokenBudgetExceeded(Exception):
+    """Raised when a prompt cannot be brought under its token budget"""
+    pass
+
+
+class TokenAccountant:
+    """Measures every LLM prompt by section, enforces budgets and keeps a cross-run ledger"""
+
+    def __init__(self, ledger_path: pathlib.Path, run_id: str, config: Optional[dict] = None):
+        config = config or {}
+        self.ledger_path = ledger_path
+        self.run_id = run_id
+        self.chars_per_token = config.get('chars_per_token', 4)
+        self.max_run_tokens = config.get('max_run_tokens')
+        self.step_budgets = config.get('steps', {})
+        self.keep_runs = config.get('keep_runs', 200)
+        self.run_input_tokens = 0
+        self.calls: List[dict] = []
+        self._pending: Dict[str, dict] = {}
+
+    def estimate_tokens(self, text: str) -> int:
+        """Rough token estimate from character count"""
+        return math.ceil(len(text) / self.chars_per_token)
+
+    def _measure(self, step: str, prompt: str, sections: Dict[str, str]) -> dict:
+        prompt_chars = max(1, len(prompt))
+        shares = {name: round(len(text) / prompt_chars, 4) for name, text in sections.items()}
+        shares['template'] = round(max(0.0, 1 - sum(shares.values())), 4)
+        return {
+            'step': step,
+            'prompt_bytes': len(prompt.encode('utf-8')),
+            'input_tokens': self.estimate_tokens(prompt),
+            'sections': {name: self.estimate_tokens(text) for name, text in sections.items()},
+            'section_shares': shares,
+            'downgraded': [],
+        }
+
+    def _budget(self, step: str) -> Optional[int]:
+        """Tightest of the step budget and what is left of the run budget"""
+        limits = []
+        step_budget = self.step_budgets.get(step, {}).get('max_input_tokens')
+        if step_budget:
+            limits.append(step_budget)
+        if self.max_run_tokens:
+            limits.append(self.max_run_tokens - self.run_input_tokens)
+        return min(limits) if limits else None
+
+    def prepare(self, step: str, sections: Dict[str, str], render: Callable[[Dict[str, str]], str],
+                downgraders: Optional[Dict[str, Callable[[str], str]]] = None) -> str:
+        """Render a prompt from its sections, downgrading or aborting if it is over budget"""
+        prompt = render(sections)
+        measurement = self._measure(step, prompt, sections)
+        budget = self._budget(step)
+
+        if budget is not None and measurement['input_tokens'] > budget:
+            policy = self.step_budgets.get(step, {})
+            if policy.get('on_exceed', 'abort') != 'downgrade':
+                raise TokenBudgetExceeded(
+                    f"{step} prompt is ~{measurement['input_tokens']} tokens, budget is {budget}")
+
+            sections = dict(sections)
+            downgraded = []
+            candidates = [name for name in policy.get('downgrade_sections', []) if name in sections]
+            # Cheapest loss first: summarize sections that have a summarizer, largest first
+            for name in sorted(candidates, key=lambda n: -len(sections[n])):
+                if downgraders and name in downgraders:
+                    sections[name] = downgraders[name](sections[name])
+                    downgraded.append(f"{name}:summarized")
+                    prompt = render(sections)
+                    if self.estimate_tokens(prompt) <= budget:
+                        break
+            # Then truncate the largest downgradable sections until the prompt fits
+            for name in sorted(candidates, key=lambda n: -len(sections[n])):
+                excess_chars = (self.estimate_tokens(prompt) - budget) * self.chars_per_token
+                if excess_chars <= 0:
+                    break
+                keep = max(0, len(sections[name]) - excess_chars - len(TRUNCATION_MARKER) - 16)
+                sections[name] = sections[name][:keep] + TRUNCATION_MARKER.format(
+                    removed=len(sections[name]) - keep)
+                downgraded.append(f"{name}:truncated")
+                prompt = render(sections)
+
+            if self.estimate_tokens(prompt) > budget:
+                raise TokenBudgetExceeded(
+                    f"{step} prompt is still ~{self.estimate_tokens(prompt)} tokens after downgrading, "
+                    f"budget is {budget}")
+            logger.warning(f"[TOKENS] {step} prompt downgraded to fit {budget} tokens: {', '.join(downgraded)}")
+            measurement = self._measure(step, prompt, sections)
+            measurement['downgraded'] = downgraded
+
+        top = sorted(((share, name) for name, share in measurement['section_shares'].items()), reverse=True)[:3]
+        logger.info(f"[TOKENS] {step}: ~{measurement['input_tokens']} input tokens "
+                    f"({measurement['prompt_bytes']} bytes; "
+                    + ", ".join(f"{name} {share:.0%}" for share, name in top) + ")")
+        self.run_input_tokens += measurement['input_tokens']
+        self._pending[step] = measurement
+        return prompt
+
+    def record_output(self, step: str, output: str, status: str = 'ok'):
+        """Attach the response size to the prepared call and update the ledger"""
+        call = self._pending.pop(step, None)
+        if call is None:
+            return
+        self._finish(call, output, status)
+
+    def record_failure(self, step: str, status: str = 'failed'):
+        """Record a prepared call that failed or timed out; its input was still spent"""
+        self.record_output(step, '', status)
+
+    def record_duplicate(self, step: str, status: str = 'hedge'):
+        """Record an extra send of the prepared prompt without output (a hedge, or a timed-out try before a retry)"""
+        call = self._pending.get(step)
+        if call is None:
+            return
+        duplicate = dict(call, sections=dict(call['sections']), section_shares=dict(call['section_shares']),
+                         downgraded=list(call['downgraded']))
+        self.run_input_tokens += duplicate['input_tokens']
+        self._finish(duplicate, '', status)
+
+    def _finish(self, call: dict, output: str, status: str):
+        call['status'] = status
+        call['output_bytes'] = len(output.encode('utf-8'))
+        call['output_tokens'] = self.estimate_tokens(output)
+        call['recorded'] = datetime.now().isoformat(timespec='seconds')
+        self.calls.append(call)
+        self._update_ledger(call)
+
+    def _update_ledger(self, call: dict):
+        with _LEDGER_LOCK:
+            ledger = {'totals': {}, 'runs': {}}
+            if self.ledger_path.exists():
+                try:
+                    ledger = json.loads(self.ledger_path.read_text(encoding='utf-8'))
+                except json.JSONDecodeError:
+                    logger.warning(f"Token ledger is corrupt, starting fresh: {self.ledger_path}")
+
+            run = ledger['runs'].setdefault(self.run_id, {'calls': [], 'totals': {}})
+            run['calls'].append(call)
+            for totals in (run['totals'], ledger['totals']):
+                self._add_to_totals(totals, call)
+            # Keep cumulative totals forever but only the most recent runs in detail
+            for run_id in sorted(ledger['runs'])[:-self.keep_runs]:
+                del ledger['runs'][run_id]
+
+            tmp_path = self.ledger_path.with_suffix('.json.tmp')
+            tmp_path.write_text(json.dumps(ledger, indent=2), encoding='utf-8')
+            os.replace(tmp_path, self.ledger_path)
+
+    @staticmethod
+    def _add_to_totals(totals: dict, call: dict):
+        for field in ('prompt_bytes', 'input_tokens', 'output_bytes', 'output_tokens'):
+            totals[field] = totals.get(field, 0) + call[field]
+        totals['calls'] = totals.get('calls', 0) + 1
+        status = call.get('status', 'ok')
+        if status != 'ok':
+            # Hedge duplicates and failed/timed-out attempts: input spent without usable output
+            totals[f"{status}_calls"] = totals.get(f"{status}_calls", 0) + 1
+        by_step = totals.setdefault('by_step', {}).setdefault(call['step'], {})
+        by_step['input_tokens'] = by_step.get('input_tokens', 0) + call['input_tokens']
+        by_step['output_tokens'] = by_step.get('output_tokens', 0) + call['output_tokens']
+        by_section = totals.setdefault('by_section', {})
+        for name, tokens in call['sections'].items():
+            key = f"{call['step']}.{name}"
+            by_section[key] = by_section.get(key, 0) + tokens
+
+    def summary(self) -> List[str]:
+        """One line per call of this run plus the run total"""
+        lines = [f"{call['step']}: ~{call['input_tokens']} in / ~{call['output_tokens']} out"
+                 + (f" ({call['status']})" if call.get('status', 'ok') != 'ok' else '')
+                 for call in self.calls]
+        if self.calls:
+            lines.append(f"run total: ~{sum(c['input_tokens'] for c in self.calls)} in / "
+                         f"~{sum(c['output_tokens'] for c in self.calls)} out")
+        return lines